@@ -53,15 +53,24 @@ async def chat(thread_id, message: dict, open_ai_service: OpenAIService = Depend
 
     run = open_ai_service.execute_thread(thread_id)
 
-    while run.status not in ['completed', 'failed']:
-        print(run.status)
-        time.sleep(1)
-        run = open_ai_service.retrieve_execution(thread_id, run.id)
-        if run.status == 'requires_action':
-            run = open_ai_service.submit_tool_outputs(thread_id, run.id, run.required_action.submit_tool_outputs.tool_calls)
-            analysis_performed = True
-
-    time.sleep(1)
+    def perform_analysis(run):
+        nonlocal analysis_performed
+        analysis_performed = True
+        return open_ai_service.submit_tool_outputs(thread_id, run.id, run.required_action.submit_tool_outputs.tool_calls)
+
+    try:
+        run = open_ai_service.wait_for_run(thread_id, run, on_requires_action=perform_analysis)
+    except TimeoutError as e:
+        print(e)
+        run = None
+
+    #failed, cancelled, expired or incomplete runs have no answer of the assistant
+    if run is None or run.status != "completed":
+        return {
+            "text": "There was an issue with your request, try again",
+            "visualization_given": False
+        }
+
     messages = open_ai_service.retrieve_messages_from_thread(thread_id)
 
     #is needed for checking, whether a visualization is given or needed
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.services.IngestionService import IngestionService
+from app.services.JobService import JobService
+from app.basemodel.NewsApiRequest import NewsApiRequest
+
+router = APIRouter()
+
+
+@router.post("/jobs/articles/news", status_code=202)
+def start_news_api_job(request: NewsApiRequest,
+                       ingestion_service: IngestionService = Depends(),
+                       job_service: JobService = Depends()):
+    """
+    Start a background job that stores one page of articles from the News API.
+
+    Parameters:
+        request (NewsApiRequest): The request containing start_date, end_date, topic, and page_number.
+        ingestion_service (IngestionService): The ingestion service instance.
+        job_service (JobService): The job service instance.
+
+    Returns:
+        dict: The ID of the started job.
+    """
+    job = job_service.submit("news", request.topic, ingestion_service.ingest_page, request)
+    return {"job_id": job.job_id}
+
+
+@router.post("/jobs/articles/news/all", status_code=202)
+def start_all_news_api_job(request: NewsApiRequest,
+                           ingestion_service: IngestionService = Depends(),
+                           job_service: JobService = Depends()):
+    """
+    Start a background job that stores all pages of articles from the News API.
+
+    Parameters:
+        request (NewsApiRequest): The request containing start_date, end_date, topic, page_number and max_in_flight.
+        ingestion_service (IngestionService): The ingestion service instance.
+        job_service (JobService): The job service instance.
+
+    Returns:
+        dict: The ID of the started job.
+    """
+    job = job_service.submit("news_all", request.topic, ingestion_service.ingest_all_pages, request)
+    return {"job_id": job.job_id}
+
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str, job_service: JobService = Depends()):
+    """
+    Get the status and progress of a job.
+
+    Parameters:
+        job_id (str): The ID of the job.
+        job_service (JobService): The job service instance.
+
+    Returns:
+        IngestionJob: The job with its status, pages fetched, articles stored and requests enqueued.
+    """
+    job = job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from chromadb.utils import embedding_functions
 from app.services.MediaService import MediaService
 from app.services.NewsApiService import NewsApiService
 from app.services.OpenAIService import OpenAIService
-from app.services.BatchApiService import BatchApiService
+from app.services.IngestionService import IngestionService
+from app.services.MigrationService import MigrationService
 from app.basemodel.Article import Article
 from app.basemodel.Query import Query
 from app.basemodel.NewsApiRequest import NewsApiRequest
@@ -112,83 +115,56 @@ def get_articles_from_news_api(request: NewsApiRequest,
 
 @router.post("/articles/news")
 def store_articles_from_news_api(request: NewsApiRequest,
-                                 media_service: MediaService = Depends(),
-                                 news_api_service: NewsApiService = Depends(),
-                                 batch_api_service: BatchApiService = Depends()):
+                                 ingestion_service: IngestionService = Depends()):
     """
-        Store articles from the News API and process them using OpenAIService.
+        Store articles from the News API and queue their keywords and summaries for the Batch API.
 
         Parameters:
             request (NewsApiRequest): The request containing start_date, end_date, topic, and page_number.
-            media_service (MediaService): The Media service instance.
-            news_api_service (NewsApiService): The News API service instance.
-            open_ai_service (OpenAIService): The OpenAI service instance.
-            batch_api_service (BatchApiService): The BatchAPI of OpenAI service instance
+            ingestion_service (IngestionService): The ingestion service instance.
 
         Returns:
             None
         """
-    articles = news_api_service.get_articles(request.topic, request.page_number, request.start_date,
-                                             request.end_date).get("news")
-    for article in articles:
-        structured_article = news_api_service.transform_article(article)
-        document_id = media_service.store_article("articles", structured_article)
-        batch_api_service.create_keywords(document_id, article.get("text"))
-        batch_api_service.create_summary(document_id, article.get("text"), 100)
+    ingestion_service.ingest_page(request)
 
 
 #this is currently only useful for changing the structure of the documents -> later purpose unknown
 @router.post("/articles/update")
-def update_date_count_of_all_articles(media_service: MediaService = Depends()):
+def update_date_count_of_all_articles(transform: str = "date_count", page_size: int = 500, resume: bool = True,
+                                      migration_service: MigrationService = Depends()):
     """
-       Update the date count of all articles in the collection.
+       Apply a metadata transform (default: the date count) to all articles in the collection, page by page.
 
        Parameters:
-           media_service (MediaService): The Media service instance.
+           transform (str): The name of the metadata transform.
+           page_size (int): The number of articles updated per page.
+           resume (bool): Whether an interrupted migration continues at its saved offset.
+           migration_service (MigrationService): The migration service instance.
 
        Returns:
-           None
+           dict: The number of processed pages, documents and updated documents.
        """
-    collection = media_service.get_collection("articles")
-
-    media_service.update_date_counts_all_articles(collection)
+    try:
+        return migration_service.run("articles", transform, page_size, resume)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/articles/news/all")
 def store_all_articles_from_news_api(request: NewsApiRequest,
-                                     media_service: MediaService = Depends(),
-                                     news_api_service: NewsApiService = Depends(),
-                                     batch_api_service: BatchApiService = Depends()):
+                                     ingestion_service: IngestionService = Depends()):
     """
-        Store all articles from the News API, handling pagination.
+        Store all articles from the News API, fetching the pages concurrently.
 
         Parameters:
-            request (NewsApiRequest): The request containing start_date, end_date, topic, and page_number.
-            media_service (MediaService): The Media service instance.
-            news_api_service (NewsApiService): The News API service instance.
-            open_ai_service (OpenAIService): The OpenAI service instance.
-            batch_api_service (BatchApiService): The BatchAPI of OpenAI
+            request (NewsApiRequest): The request containing start_date, end_date, topic, page_number and max_in_flight.
+            ingestion_service (IngestionService): The ingestion service instance.
 
         Returns:
             None
         """
-    page_number = request.page_number
-    response = news_api_service.get_articles(request.topic, page_number, request.start_date, request.end_date)
-    articles = response.get("news")
-    #this makes sure all articles are retrievedsend_request
-    while response.get("count") != 0:
-        print("PAGE: " + str(page_number))
-        for article in articles:
-            structured_article = news_api_service.transform_article(article)
-            document_id = media_service.store_article("articles", structured_article)
-            batch_api_service.create_keywords(document_id, article.get("text"))
-            batch_api_service.create_summary(document_id, article.get("text"), 100)
-
-        page_number += 1
-        if (page_number == 10): break
-        response = news_api_service.get_articles(request.topic, page_number, request.start_date, request.end_date)
-        print(response.get("count"))
-        articles = response.get("news")
+    ingestion_service.ingest_all_pages(request)
 
 
 @router.post("/articles/{collection_name}", status_code=201)
@@ -209,7 +185,8 @@ def add_article_to_collection(article: Article, collection_name: str, media_serv
 
 
 @router.post("/articles/many/{collection_name}", status_code=201)
-def add_multiple_articles_to_collection(articles, collection_name, media_service: MediaService = Depends()):
+def add_multiple_articles_to_collection(articles: list[Article], collection_name: str,
+                                        media_service: MediaService = Depends()):
     """
     Add multiple articles to a specific collection.
 
@@ -221,8 +198,64 @@ def add_multiple_articles_to_collection(articles, collection_name, media_service
     Returns:
         None
     """
-    collection = media_service.get_collection(collection_name)
-    media_service.store_multiple_articles(collection, articles)
+    media_service.store_multiple_articles(collection_name, [article.model_dump(exclude_none=True)
+                                                            for article in articles])
+
+
+@router.post("/articles/import/{collection_name}", status_code=201)
+async def import_articles_to_collection(collection_name: str, request: Request, chunk_size: int = 500,
+                                        media_service: MediaService = Depends()):
+    """
+    Import articles from an NDJSON upload (one Article per line) into a specific collection.
+    The upload is parsed while it is received and written in chunks, so memory stays flat for any upload size.
+
+    Parameters:
+        collection_name (str): The name of the collection.
+        request (Request): The request with the NDJSON body.
+        chunk_size (int): The number of articles written per write.
+        media_service (MediaService): The Media service instance.
+
+    Returns:
+        dict: The number of imported articles.
+    """
+    chunk = []
+    imported_articles = 0
+    line_number = 0
+    remainder = b""
+
+    def parse_article(line: bytes):
+        try:
+            return Article.model_validate_json(line).model_dump(exclude_none=True)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid article in line {line_number} "
+                                                        f"({imported_articles} articles imported): {e}")
+
+    async def write_chunk():
+        nonlocal chunk, imported_articles
+        await run_in_threadpool(media_service.store_multiple_articles, collection_name, chunk)
+        imported_articles += len(chunk)
+        chunk = []
+
+    async for data in request.stream():
+        lines = (remainder + data).split(b"\n")
+        #the last part can be an incomplete line, it is completed by the next data
+        remainder = lines.pop()
+
+        for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            chunk.append(parse_article(line))
+            if len(chunk) >= chunk_size:
+                await write_chunk()
+
+    if remainder.strip():
+        line_number += 1
+        chunk.append(parse_article(remainder))
+    if chunk:
+        await write_chunk()
+
+    return {"imported_articles": imported_articles}
 
 
 # only useful for development purposes, will be deleted in the end
@@ -244,6 +277,20 @@ def get_articles_from_collection(collection_name, number_of_articles: int, query
     return media_service.get_articles(number_of_articles, query.query, collection_name)
 
 
+@router.get("/articles/cache/stats")
+def get_query_cache_stats(media_service: MediaService = Depends()):
+    """
+    Get the size and the hit/miss counters of the query result cache.
+
+    Parameters:
+        media_service (MediaService): The Media service instance.
+
+    Returns:
+        dict: The number of cached results, hits and misses.
+    """
+    return media_service.get_query_cache_stats()
+
+
 #will be changed later on, to get the average amount of tokens of x articles for further improving
 @router.get("/articles/{article_id}")
 def get_amount_of_tokens_of_article(article_id: str, media_service: MediaService = Depends()):
@@ -10,16 +10,31 @@ router = APIRouter()
 @router.post("/batch/{batch_name}")
 def send_batch(batch_name: str, batch_api_service: BatchApiService = Depends()):
     """
-    Send a batch of documents to the OpenAI service.
+    Send all pending parts of a batch of documents to the OpenAI service.
 
     Parameters:
         batch_name (str): The name of the batch to be sent.
         batch_api_service (OpenAIService): The OpenAI service instance.
 
     Returns:
-        None
+        list: The IDs of the created batches.
     """
-    batch_api_service.send_batch(batch_name)
+    return batch_api_service.send_batch(batch_name)
+
+
+@router.get("/batch/estimate/{batch_name}")
+def estimate_batch_cost(batch_name: str, batch_api_service: BatchApiService = Depends()):
+    """
+    Estimate the tokens and the cost of the pending parts of a batch before sending it.
+
+    Parameters:
+        batch_name (str): The name of the batch.
+        batch_api_service (OpenAIService): The OpenAI service instance.
+
+    Returns:
+        dict: The requests, input tokens, max. output tokens and estimated cost per part and in total.
+    """
+    return batch_api_service.estimate_batch_cost(batch_name)
 
 
 @router.get("/batch/status/{batch_id}")
@@ -41,17 +56,14 @@ def check_batch_status(batch_id: str, batch_api_service: BatchApiService = Depen
 def retrieve_batch(batch_type: DocumentType = Depends(__get_document_type),
                    batch_api_service: BatchApiService = Depends()):
     """
-    Retrieve the content of batches and delete the batch files, where the ids of the batches are stored -> no usage needed anymore
+    Retrieve the content of all completed batches of a type that were not applied yet.
+    The status of the open batches is checked concurrently, pending batches stay registered for the next retrieval.
 
     Parameters:
         batch_type (DocumentType): The type of document to retrieve.
         batch_api_service (OpenAIService): The OpenAI service instance.
 
     Returns:
-        None
+        dict: The IDs of the applied batches, the status of the pending batches and the reason of the failed batches.
     """
-    batch_ids = batch_api_service.get_batch_ids(batch_type)
-    for batch_id in batch_ids:
-        batch_api_service.retrieve_batch_content(batch_id, batch_type)
-
-    batch_api_service.delete_batch_file(batch_type)
+    return batch_api_service.retrieve_completed_batches(batch_type)
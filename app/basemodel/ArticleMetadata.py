@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 class ArticleMetadata(BaseModel):
@@ -5,4 +7,6 @@ class ArticleMetadata(BaseModel):
     title: str
     author: str
     published: str
-    url: str
\ No newline at end of file
+    url: str
+    publisher: Optional[str] = None
+    date_count: Optional[int] = None
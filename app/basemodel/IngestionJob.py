@@ -0,0 +1,15 @@
+from typing import Optional
+
+from pydantic import BaseModel
+
+class IngestionJob(BaseModel):
+    job_id: str
+    job_type: str
+    topic: str
+    status: str = "queued"
+    pages_fetched: int = 0
+    articles_stored: int = 0
+    requests_enqueued: int = 0
+    error: Optional[str] = None
+    created_at: str
+    finished_at: Optional[str] = None
@@ -1,7 +1,11 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 class NewsApiRequest(BaseModel):
     start_date: str
     end_date: str
     topic: str
-    page_number: int
\ No newline at end of file
+    page_number: int
+    max_in_flight: Optional[int] = None
+    combined_enrichment: bool = False
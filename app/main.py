@@ -4,6 +4,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.chat_api import router as chat_router
 from app.api.media_api import router as media_router
 from app.api.openai_batch_api import router as openai_router
+from app.api.job_api import router as job_router
 
 app = FastAPI()
 
@@ -18,6 +19,7 @@ app.add_middleware(
 app.include_router(chat_router, prefix="/api/v1")
 app.include_router(media_router, prefix="/api/v1")
 app.include_router(openai_router, prefix="/api/v1")
+app.include_router(job_router, prefix="/api/v1")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+from openai import AsyncOpenAI
+
+from app.utils.analysis_utils import extract_numbered_results
+from app.utils.disk_cache import DiskCache
+
+
+class AnalysisService:
+    config = yaml.safe_load(open("openai_config.yaml"))
+    model = "gpt-3.5-turbo-0125"
+
+    # number of partitions that are analyzed by the model at the same time
+    max_concurrency = 8
+    request_timeout = 60
+    max_retries = 2
+
+    # the chat endpoint runs inside an event loop, then the analysis gets an own loop in this thread
+    executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="analysis")
+
+    instructions = "you are an analyst that does sentiment-analysis of media-articles, talk in a professional and reasoning way"
+
+    # the sentiment of an article for the same categories, prompt and model does not change between analyses
+    sentiment_cache = DiskCache("sentiment_cache.db", ttl=None, max_bytes=256 * 1024 * 1024)
+
+    def get_cached_sentiments(self, articles: list, user_prompt: str, expected_categories: list):
+        """
+                Get the sentiments of the articles that were already analyzed with the same text
+                for these categories and this prompt.
+
+                Parameters:
+                    articles (list[tuple]): The (article ID, text) pairs of the articles.
+                    user_prompt (str): The user prompt containing the problem to be solved.
+                    expected_categories (list): The expected sentiment categories.
+
+                Returns:
+                    dict: The sentiment by article ID, only for the cached articles.
+        """
+        keys = {self.__get_cache_key(article_id, text, user_prompt, expected_categories): article_id
+                for article_id, text in articles}
+        cached = self.sentiment_cache.get_many(list(keys.keys()))
+
+        return {keys[key]: sentiment for key, sentiment in cached.items()}
+
+    def analyze_partitions(self, partitions: list, user_prompt: str, expected_categories: list,
+                           max_concurrency: int = None):
+        """
+                Analyze all partitions of articles with concurrent chat completion requests and cache the sentiments.
+
+                Parameters:
+                    partitions (list[list[tuple]]): The (article ID, text) pairs of every partition.
+                    user_prompt (str): The user prompt containing the problem to be solved.
+                    expected_categories (list): The expected sentiment categories.
+                    max_concurrency (int): The maximum number of requests at the same time (default: max_concurrency).
+
+                Returns:
+                    dict: The sentiment by article ID, for every article the model gave a valid result for.
+        """
+        coroutine = self.__analyze_all(partitions, user_prompt, expected_categories,
+                                       max_concurrency or self.max_concurrency)
+        try:
+            asyncio.get_running_loop()
+            in_event_loop = True
+        except RuntimeError:
+            in_event_loop = False
+
+        if in_event_loop:
+            sentiments = self.executor.submit(asyncio.run, coroutine).result()
+        else:
+            sentiments = asyncio.run(coroutine)
+
+        #articles without a valid result are not cached, so they are analyzed again the next time
+        texts = {article_id: text for article_list in partitions for article_id, text in article_list}
+        self.sentiment_cache.set_many({
+            self.__get_cache_key(article_id, texts[article_id], user_prompt, expected_categories): sentiment
+            for article_id, sentiment in sentiments.items()})
+
+        return sentiments
+
+    async def __analyze_all(self, partitions: list, user_prompt: str, expected_categories: list, max_concurrency: int):
+        """
+                Send the requests of all partitions, limited by a semaphore.
+
+                Parameters:
+                    partitions (list[list[tuple]]): The (article ID, text) pairs of every partition.
+                    user_prompt (str): The user prompt containing the problem to be solved.
+                    expected_categories (list): The expected sentiment categories.
+                    max_concurrency (int): The maximum number of requests at the same time.
+
+                Returns:
+                    dict: The sentiment by article ID of every partition that could be analyzed.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        #the async client is bound to the event loop, so every analysis uses an own client
+        async with AsyncOpenAI(api_key=self.config['KEYS']['openai'], timeout=self.request_timeout,
+                               max_retries=self.max_retries) as client:
+            results = await asyncio.gather(
+                *[self.__analyze_partition(client, semaphore, article_list, user_prompt, expected_categories)
+                  for article_list in partitions if article_list],
+                return_exceptions=True
+            )
+
+        sentiments = {}
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"list of articles generated an exception: {result}")
+            else:
+                sentiments.update(result)
+
+        return sentiments
+
+    async def __analyze_partition(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore, article_list: list,
+                                  user_prompt: str, expected_categories: list):
+        """
+                Analyze one partition of articles and generate the sub-result for the final result.
+
+                Parameters:
+                    client (AsyncOpenAI): The client of the current event loop.
+                    semaphore (asyncio.Semaphore): Limits the number of requests at the same time.
+                    article_list (list[tuple]): The (article ID, text) pairs of the partition.
+                    user_prompt (str): The user prompt containing the problem to be solved.
+                    expected_categories (list): The expected sentiment categories.
+
+                Returns:
+                    dict: The sentiment by article ID.
+        """
+        #the articles are numbered, so every result can be assigned to its article
+        provided_data = "\n\n".join(f"[{number}] {text}" for number, (_, text) in enumerate(article_list, start=1))
+
+        #prompt for generating the sub-result
+        request = ("You are a sentiment analysis assistant" + "with these categories " + str(
+            expected_categories) + ", I give you texts and you give me the results on "
+                                   " this topic with these categories") + user_prompt + "\n" + provided_data + "\n" + (
+                      "Please enter one result per article in this format without text: Number, result"
+        )
+
+        messages = [
+            {"role": "system", "content": self.instructions},
+            {"role": "user", "content": request}
+        ]
+
+        async with semaphore:
+            answer = await self.__complete(client, messages)
+            result = extract_numbered_results(answer)
+
+            #if the model doesnt give us the result we ask why, this mostly solves the problem
+            if len(result) == 0:
+                messages.append({"role": "assistant", "content": answer})
+                messages.append({"role": "user", "content": "why not? Just use the provided texts by me"})
+                result = extract_numbered_results(await self.__complete(client, messages))
+
+        #filter out the bad results that dont match the expected results or an article of the partition
+        categories = self.__normalize_categories(expected_categories)
+        sentiments = {}
+        for number, sentiment in result:
+            if 1 <= int(number) <= len(article_list) and sentiment.lower() in categories:
+                sentiments[article_list[int(number) - 1][0]] = sentiment.lower()
+
+        return sentiments
+
+    async def __complete(self, client: AsyncOpenAI, messages: list):
+        """
+                Send a chat completion request.
+
+                Parameters:
+                    client (AsyncOpenAI): The client of the current event loop.
+                    messages (list[dict]): The messages of the conversation.
+
+                Returns:
+                    str: The answer of the model.
+        """
+        completion = await client.chat.completions.create(model=self.model, messages=messages)
+        return completion.choices[0].message.content or ""
+
+    def __get_cache_key(self, article_id: str, text: str, user_prompt: str, expected_categories: list):
+        """
+                Get the cache key of the sentiment of an article.
+
+                The analyzed text is part of the key, because articles are stored without content
+                and only get their text with the summary of the batch api.
+
+                Parameters:
+                    article_id (str): The ID of the article.
+                    text (str): The analyzed text of the article.
+                    user_prompt (str): The user prompt containing the problem to be solved.
+                    expected_categories (list): The expected sentiment categories.
+
+                Returns:
+                    str: The hash of the article ID and text, the normalized categories and prompt and the model.
+        """
+        return DiskCache.make_key({
+            "article_id": article_id,
+            "text": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            "categories": self.__normalize_categories(expected_categories),
+            "prompt": " ".join(user_prompt.lower().split()),
+            "model": self.model
+        })
+
+    @staticmethod
+    def __normalize_categories(expected_categories: list):
+        """
+                Normalize the categories, so their order, case and surrounding whitespace do not matter.
+
+                Parameters:
+                    expected_categories (list): The expected sentiment categories.
+
+                Returns:
+                    list[str]: The sorted, lowercase categories without duplicates.
+        """
+        return sorted({category.strip().lower() for category in expected_categories})
@@ -1,11 +1,45 @@
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from app.services.MediaService import MediaService, DocumentType
 from app.services.OpenAIService import OpenAIService
+from app.services.TokenizerService import TokenizerService
+from app.utils.batch_registry import BatchRegistry
+from app.utils.batch_writer import BatchFileWriter
+from app.utils.disk_cache import DiskCache
 class BatchApiService:
 
     openaiservice = OpenAIService()
     mediaservice = MediaService()
+    tokenizerservice = TokenizerService()
+
+    # longer article texts are truncated before they are sent, so no request exceeds the context window
+    max_input_tokens = 3000
+
+    # Batch API prices of gpt-3.5-turbo-0125 in USD per 1M tokens
+    input_token_price = 0.25
+    output_token_price = 0.75
+
+    # limits of the OpenAI Batch API for a single input file
+    max_requests_per_batch = 50000
+    max_bytes_per_batch = 100 * 1024 * 1024
+
+    # number of documents updated at once when a batch output is applied
+    update_chunk_size = 500
+
+    # batches in these states will not change anymore and are not polled again
+    failed_batch_statuses = ["failed", "expired", "cancelled"]
+    max_status_workers = 8
+
+    batch_registry = BatchRegistry("batch_registry.db")
+
+    # outputs of completed requests by prompt hash, identical texts (e.g. syndicated dpa copy) are only paid once
+    prompt_cache = DiskCache("prompt_cache.db", ttl=None, max_bytes=256 * 1024 * 1024)
+
+    # one open writer per batch file, shared by all ingestion jobs of the process
+    batch_writers = {}
+    batch_writers_lock = threading.Lock()
 
     # TODO keywords of an article is not used anywhere, maybe delete afterwards
     def create_keywords(self, document_id, text):
@@ -17,9 +51,10 @@ class BatchApiService:
                     text (str): The text of the document.
 
                 Returns:
-                    None
+                    bool: True if a request was queued, False if the keywords were known already.
         """
-        text = "can you just give me 5 keywords for the following text without numbering or similar" + text
+        text = ("can you just give me 5 keywords for the following text without numbering or similar"
+                + self.tokenizerservice.truncate(text, self.max_input_tokens))
 
         request = {
             "custom_id": document_id,
@@ -41,7 +76,7 @@ class BatchApiService:
                 "max_tokens": 1000
             }
         }
-        return self.__add_to_batch(request, "batch_keywords.jsonl")
+        return self.__queue_request(request, "batch_keywords.jsonl", DocumentType.KEYWORDS)
 
     # das hier muss an die Batch-API gesendet werden -> eigener Batch
     def create_summary(self, document_id: str, text: str, length):
@@ -54,10 +89,11 @@ class BatchApiService:
                     length (int): The maximum length of the summary.
 
                 Returns:
-                    None
+                    bool: True if a request was queued, False if the summary was known already.
         """
         text = "can you send me a summary of the following text in max. " + str(
-            length) + " words without changing the wording of the text: " + text
+            length) + " words without changing the wording of the text: " + self.tokenizerservice.truncate(
+            text, self.max_input_tokens)
 
         request = {
             "custom_id": document_id,
@@ -79,45 +115,112 @@ class BatchApiService:
                 "max_tokens": 1000
             }
         }
-        return self.__add_to_batch(request, "batch_summary.jsonl")
+        return self.__queue_request(request, "batch_summary.jsonl", DocumentType.SUMMARY)
+
+    def create_enrichment(self, document_id: str, text: str, length):
+        """
+                Create keywords and a summary for a document with one request, answered as JSON object.
+
+                Parameters:
+                    document_id (str): The ID of the document.
+                    text (str): The text of the document.
+                    length (int): The maximum length of the summary.
+
+                Returns:
+                    bool: True if a request was queued, False if the enrichment was known already.
+        """
+        text = ("give me 5 keywords and a summary of the following text in max. " + str(length)
+                + " words without changing the wording of the text: "
+                + self.tokenizerservice.truncate(text, self.max_input_tokens))
+
+        request = {
+            "custom_id": document_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": "gpt-3.5-turbo-0125",
+                "response_format": {"type": "json_object"},
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": "You are a helpful assistant who derives 5 representative keywords and writes "
+                                   "a concise but detailed summary from a text. Answer only with a JSON object "
+                                   "of the form {\"keywords\": \"keyword1, keyword2, ...\", \"summary\": \"...\"}."
+                    },
+                    {
+                        "role": "user",
+                        "content": text
+                    }
+                ],
+                "max_tokens": 1000
+            }
+        }
+        return self.__queue_request(request, "batch_enrichment.jsonl", DocumentType.ENRICHMENT)
+
+    def flush_batches(self):
+        """
+                Write the buffered requests of all batch files to disk.
+
+                Called once an ingested page is stored, because articles that are already stored are skipped
+                on re-ingestion and their requests would otherwise never be queued again after a crash.
+
+                Returns:
+                    None
+        """
+        with self.batch_writers_lock:
+            batch_writers = list(self.batch_writers.values())
+
+        for batch_writer in batch_writers:
+            batch_writer.flush()
 
     def send_batch(self, batch_name: str):
         """
-                Send a batch of requests.
+                Send all pending parts of a batch of requests.
 
                 Parameters:
                     batch_name (str): The name of the batch file.
 
                 Returns:
-                    None
+                    list: The IDs of the created batches.
         """
-        batch_input_file = self.openaiservice.client.files.create(
-            file=open(batch_name, "rb"),
-            purpose="batch"
-        )
-        batch = self.openaiservice.client.batches.create(
-            input_file_id=batch_input_file.id,
-            endpoint="/v1/chat/completions",
-            completion_window="24h",
-            metadata={
-                "description": "nightly eval job"
-            }
-        )
+        batch_ids = []
+        for part in self.__get_batch_writer(batch_name).get_pending_parts():
+            with open(part, "rb") as file:
+                batch_input_file = self.openaiservice.client.files.create(
+                    file=file,
+                    purpose="batch"
+                )
+            batch = self.openaiservice.client.batches.create(
+                input_file_id=batch_input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+                metadata={
+                    "description": "nightly eval job"
+                }
+            )
+
+            if (batch_name == "batch_summary.jsonl"):
+                batch_type = DocumentType.SUMMARY
+            elif (batch_name == "batch_enrichment.jsonl"):
+                batch_type = DocumentType.ENRICHMENT
+            else:
+                batch_type = DocumentType.KEYWORDS
+            self.batch_registry.register(batch.id, batch_type.value, batch.status, part)
+
+            #the requests are uploaded now, sending the part again would duplicate them
+            os.remove(part)
+            batch_ids.append(batch.id)
 
-        if (batch_name == "batch_summary.jsonl"):
-            with open("batch_ids_summary", 'a') as file:
-                file.write('\n' + batch.id)
-        else:
-            with open("batch_ids_keywords", 'a') as file:
-                file.write('\n' + batch.id)
+        return batch_ids
 
-    def retrieve_batch_content(self, batch_id: str, content_type):
+    def retrieve_batch_content(self, batch_id: str, content_type, chunk_size: int = None):
         """
-                Retrieve the content of a batch.
+                Retrieve the content of a batch and apply it to the articles.
 
                 Parameters:
                     batch_id (str): The ID of the batch.
-                    content_type (DocumentType): The type of content (SUMMARY or KEYWORDS).
+                    content_type (DocumentType): The type of content (SUMMARY, KEYWORDS or ENRICHMENT).
+                    chunk_size (int): The number of documents updated at once (default: update_chunk_size).
 
                 Returns:
                     str: The status of the batch if not completed, otherwise None.
@@ -126,17 +229,111 @@ class BatchApiService:
         if batch.status != "completed":
             return "Your batch is currently not ready and in the state: " + batch.status
 
-        output_file = self.openaiservice.client.files.content(batch.output_file_id)
+        self.__apply_batch_output(batch.output_file_id, content_type, chunk_size)
+
+    def retrieve_completed_batches(self, batch_type):
+        """
+                Check the status of all open batches of a type concurrently and apply the output
+                of every completed batch that was not applied yet.
 
-        content = output_file.content
-        content_str = content.decode('utf-8')
-        lines = content_str.splitlines()
-        request_list = [json.loads(line) for line in lines]
+                Parameters:
+                    batch_type (DocumentType): The type of document (SUMMARY, KEYWORDS or ENRICHMENT).
 
-        for request in request_list:
-            document_id = request.get("custom_id")
-            response = request.get("response").get("body").get("choices")[0].get("message").get("content")
-            self.mediaservice.update_collection("articles", document_id, content_type, response)
+                Returns:
+                    dict: The IDs of the applied batches, the status of the batches that are still pending
+                          and the reason of every batch that failed.
+        """
+        self.__import_batch_id_file(batch_type)
+
+        open_batches = self.batch_registry.get_batches(batch_type.value, applied=False,
+                                                       exclude_statuses=self.failed_batch_statuses)
+        if not open_batches:
+            return {"applied": [], "pending": {}, "failed": {}}
+
+        with ThreadPoolExecutor(max_workers=min(self.max_status_workers, len(open_batches))) as executor:
+            batches = list(executor.map(self.__retrieve_batch, [batch["batch_id"] for batch in open_batches]))
+
+        applied_batches = []
+        pending_batches = {}
+        failed_batches = {}
+        for open_batch, batch in zip(open_batches, batches):
+            #a batch whose status could not be retrieved is checked again the next time
+            if batch is None:
+                failed_batches[open_batch["batch_id"]] = "status could not be retrieved"
+                continue
+
+            self.batch_registry.update_status(batch.id, batch.status)
+            if batch.status != "completed":
+                pending_batches[batch.id] = batch.status
+                continue
+
+            #when every request of a batch failed, it is completed without an output file
+            if not batch.output_file_id:
+                print(f"Batch {batch.id} has no output, error file: {batch.error_file_id}")
+                self.batch_registry.mark_applied(batch.id)
+                failed_batches[batch.id] = f"no output, error file: {batch.error_file_id}"
+                continue
+
+            try:
+                self.__apply_batch_output(batch.output_file_id, batch_type)
+            except Exception as e:
+                print(f"Output of batch {batch.id} could not be applied: {e}")
+                failed_batches[batch.id] = str(e)
+                continue
+
+            self.batch_registry.mark_applied(batch.id)
+            applied_batches.append(batch.id)
+
+        return {"applied": applied_batches, "pending": pending_batches, "failed": failed_batches}
+
+    def estimate_batch_cost(self, batch_name: str):
+        """
+                Estimate the tokens and the cost of all pending parts of a batch.
+                The output tokens are an upper bound, based on the max_tokens of every request.
+
+                Parameters:
+                    batch_name (str): The name of the batch file.
+
+                Returns:
+                    dict: The requests, input tokens, max. output tokens and estimated cost of every part and in total.
+        """
+        parts = []
+        for part in self.__get_batch_writer(batch_name).get_pending_parts(close=False):
+            requests = 0
+            input_tokens = 0
+            max_output_tokens = 0
+            messages = []
+
+            with open(part, "r", encoding="utf-8") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    body = json.loads(line).get("body")
+                    requests += 1
+                    max_output_tokens += body.get("max_tokens", 0)
+                    messages.extend(message.get("content") for message in body.get("messages"))
+
+                    if len(messages) >= 1000:
+                        input_tokens += self.__count_message_tokens(messages)
+                        messages = []
+
+            input_tokens += self.__count_message_tokens(messages)
+            parts.append({
+                "file": part,
+                "requests": requests,
+                "input_tokens": input_tokens,
+                "max_output_tokens": max_output_tokens,
+                "estimated_cost_usd": round(input_tokens / 1e6 * self.input_token_price
+                                            + max_output_tokens / 1e6 * self.output_token_price, 4)
+            })
+
+        return {
+            "parts": parts,
+            "requests": sum(part["requests"] for part in parts),
+            "input_tokens": sum(part["input_tokens"] for part in parts),
+            "max_output_tokens": sum(part["max_output_tokens"] for part in parts),
+            "estimated_cost_usd": round(sum(part["estimated_cost_usd"] for part in parts), 4)
+        }
 
     def check_batch_status(self, batch_id: str):
         """
@@ -151,49 +348,162 @@ class BatchApiService:
         batch = self.openaiservice.client.batches.retrieve(batch_id)
         return batch.status
 
-    def delete_batch_file(self, batch_type):
+    def get_batch_ids(self, batch_type):
         """
-                Delete a batch file which contains the ids of the batches.
+                Get the IDs of all batches of a type whose output was not applied yet.
 
                 Parameters:
-                    batch_type (DocumentType): The type of document (SUMMARY or KEYWORDS).
+                    batch_type (DocumentType): The type of document (SUMMARY, KEYWORDS or ENRICHMENT).
 
                 Returns:
-                    None
+                    list: A list of batch IDs.
         """
-        if batch_type == DocumentType.SUMMARY:
-            file_name = "batch_ids_summary"
-        else:
-            file_name = "batch_ids_keywords"
+        return [batch["batch_id"] for batch in self.batch_registry.get_batches(batch_type.value, applied=False)]
+
+    def __count_message_tokens(self, messages: list):
+        """
+                Count the prompt tokens of chat messages, including the overhead the chat format adds per message.
+
+                Parameters:
+                    messages (list[str]): The contents of the messages.
+
+                Returns:
+                    int: The number of prompt tokens.
+        """
+        if not messages:
+            return 0
+        return sum(self.tokenizerservice.count_tokens_many(messages)) + 4 * len(messages)
+
+    def __retrieve_batch(self, batch_id: str):
+        """
+                Retrieve a batch, without letting a failed request stop the retrieval of the other batches.
 
+                Parameters:
+                    batch_id (str): The ID of the batch.
+
+                Returns:
+                    Batch: The batch or None if it could not be retrieved.
+        """
         try:
-            os.remove(file_name)
-            print(f"File '{file_name}' deleted successfully.")
-        except OSError as e:
-            print(f"Error deleting file '{file_name}': {e}")
+            return self.openaiservice.client.batches.retrieve(batch_id)
+        except Exception as e:
+            print(f"Status of batch {batch_id} could not be retrieved: {e}")
+            return None
 
-    def get_batch_ids(self, batch_type):
+    def __apply_batch_output(self, output_file_id: str, content_type, chunk_size: int = None):
         """
-                Get batch IDs from a file.
+                Apply the output file of a batch to the articles.
+                The output file is parsed while it is downloaded and applied in chunks.
 
                 Parameters:
-                    batch_type (DocumentType): The type of document (SUMMARY or KEYWORDS).
+                    output_file_id (str): The ID of the output file of the batch.
+                    content_type (DocumentType): The type of content (SUMMARY, KEYWORDS or ENRICHMENT).
+                    chunk_size (int): The number of documents updated at once (default: update_chunk_size).
 
                 Returns:
-                    list: A list of batch IDs.
+                    None
+        """
+        chunk_size = chunk_size or self.update_chunk_size
+        contents = {}
+        prompt_keys = {}
+
+        with self.openaiservice.client.files.with_streaming_response.content(output_file_id) as output_file:
+            for line in output_file.iter_lines():
+                if not line.strip():
+                    continue
+
+                request = json.loads(line)
+                document_id, _, prompt_key = request.get("custom_id").partition("|")
+                response = request.get("response")
+                if request.get("error") or response is None or response.get("status_code") != 200:
+                    print(f"Request for document {document_id} failed: {request.get('error')}")
+                    continue
+
+                contents[document_id] = response.get("body").get("choices")[0].get("message").get("content")
+                if prompt_key:
+                    prompt_keys[document_id] = prompt_key
+
+                if len(contents) >= chunk_size:
+                    self.__apply_contents(contents, prompt_keys, content_type, chunk_size)
+                    contents = {}
+                    prompt_keys = {}
+
+        if contents:
+            self.__apply_contents(contents, prompt_keys, content_type, chunk_size)
+
+    def __apply_contents(self, contents: dict, prompt_keys: dict, content_type, chunk_size: int):
+        """
+                Update the documents with the outputs of a batch and cache the outputs that were applied.
+                Outputs that were rejected, e.g. enrichments that are no valid JSON, are not cached.
+
+                Parameters:
+                    contents (dict): The output of every document, by document ID.
+                    prompt_keys (dict): The prompt hash of every document, by document ID.
+                    content_type (DocumentType): The type of content (SUMMARY, KEYWORDS or ENRICHMENT).
+                    chunk_size (int): The number of documents updated at once.
+
+                Returns:
+                    None
+        """
+        updated_ids = self.mediaservice.update_documents("articles", content_type, contents, chunk_size)
+        self.prompt_cache.set_many({prompt_keys[document_id]: contents[document_id]
+                                    for document_id in updated_ids if document_id in prompt_keys})
+
+    def __import_batch_id_file(self, batch_type):
+        """
+                Move the batch IDs of the file written by earlier versions into the batch registry.
+
+                Parameters:
+                    batch_type (DocumentType): The type of document (SUMMARY, KEYWORDS or ENRICHMENT).
+
+                Returns:
+                    None
         """
-        batch_ids = []
         if batch_type == DocumentType.SUMMARY:
-            filename = "batch_ids_summary"
+            file_name = "batch_ids_summary"
+        elif batch_type == DocumentType.KEYWORDS:
+            file_name = "batch_ids_keywords"
         else:
-            filename = "batch_ids_keywords"
+            return
 
-        with open(filename, "r") as file:
+        if not os.path.exists(file_name):
+            return
+
+        with open(file_name, "r") as file:
             for line in file:
                 batch_id = line.strip()
                 if batch_id:
-                    batch_ids.append(batch_id)
-        return batch_ids
+                    self.batch_registry.register(batch_id, batch_type.value, "unknown")
+
+        os.remove(file_name)
+        print(f"Batch IDs of '{file_name}' were moved into the batch registry.")
+
+    def __queue_request(self, request: dict, file_name: str, content_type):
+        """
+                Apply the known output of an identical prompt to the document, or add the request to a batch file.
+
+                Parameters:
+                    request (dict): The request to queue, its custom_id is the ID of the document.
+                    file_name (str): The name of the batch file.
+                    content_type (DocumentType): The type of content (SUMMARY, KEYWORDS or ENRICHMENT).
+
+                Returns:
+                    bool: True if the request was added to the batch file, False if a known output was applied
+                          or the request is already in the batch file.
+        """
+        prompt_key = DiskCache.make_key(request.get("body"))
+        cached_output = self.prompt_cache.get(prompt_key)
+        if cached_output is not None:
+            document_id = request.get("custom_id")
+            if document_id in self.mediaservice.update_documents("articles", content_type, {document_id: cached_output}):
+                return False
+
+            #a cached output that is rejected, e.g. an invalid enrichment, is a cache miss
+            self.prompt_cache.delete(prompt_key)
+
+        #the prompt hash travels with the request, so the output can be cached when the batch is retrieved
+        request["custom_id"] = request.get("custom_id") + "|" + prompt_key
+        return self.__add_to_batch(request, file_name)
 
     def __add_to_batch(self, request: dict, file_name: str):
         """
@@ -204,9 +514,22 @@ class BatchApiService:
                     file_name (str): The name of the batch file.
 
                 Returns:
-                    None
+                    bool: True if the request was added, False if it is already in the current part.
+        """
+        return self.__get_batch_writer(file_name).write(request)
+
+    def __get_batch_writer(self, batch_name: str):
         """
-        with open(file_name, 'a') as file:
-            json_str = json.dumps(request)
-            file.write(json_str + '\n')
+                Get the writer of a batch file, creating it on first use.
+
+                Parameters:
+                    batch_name (str): The name of the batch file.
 
+                Returns:
+                    BatchFileWriter: The writer of the batch file.
+        """
+        with self.batch_writers_lock:
+            if batch_name not in self.batch_writers:
+                self.batch_writers[batch_name] = BatchFileWriter(batch_name, self.max_requests_per_batch,
+                                                                 self.max_bytes_per_batch)
+            return self.batch_writers[batch_name]
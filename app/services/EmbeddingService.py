@@ -0,0 +1,82 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from chromadb.utils import embedding_functions
+
+from app.utils.disk_cache import DiskCache
+
+
+class EmbeddingService:
+    # the same model chroma uses for collections without an own embedding function
+    model_name = "all-MiniLM-L6-v2"
+    embedding_function = embedding_functions.DefaultEmbeddingFunction()
+
+    batch_size = 256
+    max_workers = 4
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+
+    # vectors by content hash, so re-ingested or duplicated texts are only embedded once
+    embedding_cache = DiskCache("embedding_cache.db", ttl=None, max_bytes=2 * 1024 * 1024 * 1024)
+
+    def embed_documents(self, texts: list):
+        """
+                Get the embeddings of many texts, computing the ones that are not cached in batches on the worker pool.
+
+                Parameters:
+                    texts (list[str]): The texts to embed.
+
+                Returns:
+                    list: The embedding of every text, in the order of the texts.
+        """
+        keys = [self.__get_key(text) for text in texts]
+        embeddings = self.embedding_cache.get_many(keys)
+
+        missing_texts = {key: text for key, text in zip(keys, texts) if key not in embeddings}
+        if missing_texts:
+            missing_keys = list(missing_texts.keys())
+            batches = [[missing_texts[key] for key in missing_keys[start:start + self.batch_size]]
+                       for start in range(0, len(missing_keys), self.batch_size)]
+
+            computed = [embedding for batch in self.executor.map(self.__embed_batch, batches) for embedding in batch]
+            new_embeddings = dict(zip(missing_keys, computed))
+
+            self.embedding_cache.set_many(new_embeddings)
+            embeddings.update(new_embeddings)
+
+        return [embeddings[key] for key in keys]
+
+    def embed_query(self, text: str):
+        """
+                Get the embedding of a query text.
+
+                Parameters:
+                    text (str): The query text.
+
+                Returns:
+                    list: The embedding of the query.
+        """
+        return self.embed_documents([text])[0]
+
+    def __embed_batch(self, texts: list):
+        """
+                Compute the embeddings of a batch of texts.
+
+                Parameters:
+                    texts (list[str]): The texts to embed.
+
+                Returns:
+                    list: The embeddings as lists of floats.
+        """
+        return [[float(value) for value in embedding] for embedding in self.embedding_function(texts)]
+
+    def __get_key(self, text: str):
+        """
+                Get the cache key of a text.
+
+                Parameters:
+                    text (str): The text.
+
+                Returns:
+                    str: The hash of the model name and the text.
+        """
+        return hashlib.sha256((self.model_name + "\n" + (text or "")).encode("utf-8")).hexdigest()
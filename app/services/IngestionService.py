@@ -0,0 +1,83 @@
+from app.basemodel.IngestionJob import IngestionJob
+from app.basemodel.NewsApiRequest import NewsApiRequest
+from app.services.BatchApiService import BatchApiService
+from app.services.MediaService import MediaService
+from app.services.NewsApiService import NewsApiService
+
+
+class IngestionService:
+    mediaservice = MediaService()
+    newsapiservice = NewsApiService()
+    batchapiservice = BatchApiService()
+
+    def ingest_page(self, request: NewsApiRequest, job: IngestionJob = None):
+        """
+                Store the articles of one page of the News API and queue their keywords and summaries.
+
+                Parameters:
+                    request (NewsApiRequest): The request containing start_date, end_date, topic, page_number
+                                              and combined_enrichment.
+                    job (IngestionJob): The job whose progress is updated (optional).
+
+                Returns:
+                    None
+        """
+        articles = self.newsapiservice.get_articles(request.topic, request.page_number, request.start_date,
+                                                    request.end_date).get("news")
+        self.__store_page(articles, request.combined_enrichment, job)
+
+    def ingest_all_pages(self, request: NewsApiRequest, job: IngestionJob = None):
+        """
+                Store the articles of all pages of the News API, starting at the requested page.
+
+                Parameters:
+                    request (NewsApiRequest): The request containing start_date, end_date, topic, page_number,
+                                              max_in_flight and combined_enrichment.
+                    job (IngestionJob): The job whose progress is updated (optional).
+
+                Returns:
+                    None
+        """
+        pages = self.newsapiservice.get_all_articles(request.topic, request.page_number, request.start_date,
+                                                     request.end_date, request.max_in_flight)
+        #pages are fetched concurrently, but arrive here in order until the first empty page
+        for page_number, response in pages:
+            print("PAGE: " + str(page_number))
+            self.__store_page(response.get("news"), request.combined_enrichment, job)
+
+    def __store_page(self, articles: list, combined_enrichment: bool = False, job: IngestionJob = None):
+        """
+                Store the articles of a page and queue keywords and summaries for the newly stored ones.
+
+                Parameters:
+                    articles (list): The articles of the page as returned by the News API.
+                    combined_enrichment (bool): Whether keywords and summary are queued as one combined request.
+                    job (IngestionJob): The job whose progress is updated (optional).
+
+                Returns:
+                    None
+        """
+        structured_articles = [self.newsapiservice.transform_article(article) for article in articles]
+        texts = {self.mediaservice.generate_article_id(structured_article): article.get("text")
+                 for structured_article, article in zip(structured_articles, articles)}
+
+        document_ids = self.mediaservice.store_articles("articles", structured_articles)
+
+        #only articles that were not stored before need keywords and a summary
+        requests_enqueued = 0
+        for document_id in document_ids:
+            if combined_enrichment:
+                requests_enqueued += self.batchapiservice.create_enrichment(document_id, texts[document_id], 100)
+                continue
+
+            requests_enqueued += self.batchapiservice.create_keywords(document_id, texts[document_id])
+            requests_enqueued += self.batchapiservice.create_summary(document_id, texts[document_id], 100)
+
+        #the page is stored in chroma, so its requests have to be on disk as well
+        if requests_enqueued:
+            self.batchapiservice.flush_batches()
+
+        if job is not None:
+            job.pages_fetched += 1
+            job.articles_stored += len(document_ids)
+            job.requests_enqueued += requests_enqueued
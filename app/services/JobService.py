@@ -0,0 +1,89 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.basemodel.IngestionJob import IngestionJob
+
+
+class JobService:
+    max_workers = 4
+    max_finished_jobs = 1000
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion-job")
+    jobs = {}
+    jobs_lock = threading.Lock()
+
+    def submit(self, job_type: str, topic: str, function, *args):
+        """
+                Run a function on the worker pool and keep track of it as a job.
+
+                Parameters:
+                    job_type (str): The type of the job, e.g. the name of the ingestion.
+                    topic (str): The topic the job is about.
+                    function (callable): The function to run, it receives the job as last argument.
+                    *args: The arguments passed to the function before the job.
+
+                Returns:
+                    IngestionJob: The queued job.
+        """
+        job = IngestionJob(
+            job_id=str(uuid.uuid4()),
+            job_type=job_type,
+            topic=topic,
+            created_at=datetime.now().isoformat()
+        )
+
+        with self.jobs_lock:
+            self.__remove_finished_jobs()
+            self.jobs[job.job_id] = job
+
+        self.executor.submit(self.__run, job, function, *args)
+        return job
+
+    def get_job(self, job_id: str):
+        """
+                Get a job by its ID.
+
+                Parameters:
+                    job_id (str): The ID of the job.
+
+                Returns:
+                    IngestionJob: The job, or None if it is unknown.
+        """
+        with self.jobs_lock:
+            return self.jobs.get(job_id)
+
+    def __run(self, job: IngestionJob, function, *args):
+        """
+                Execute a job and record its final state.
+
+                Parameters:
+                    job (IngestionJob): The job to execute.
+                    function (callable): The function to run.
+                    *args: The arguments passed to the function before the job.
+
+                Returns:
+                    None
+        """
+        job.status = "running"
+        try:
+            function(*args, job)
+            job.status = "completed"
+        except Exception as e:
+            print(f"Job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.now().isoformat()
+
+    def __remove_finished_jobs(self):
+        """
+                Forget the oldest finished jobs once more than max_finished_jobs are kept.
+
+                Returns:
+                    None
+        """
+        finished_jobs = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished_jobs[:max(0, len(finished_jobs) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
@@ -1,52 +1,74 @@
-import os
-import chromadb
+import copy
+import heapq
+import json
+import threading
+import time
 import uuid
-import tiktoken
-from datetime import datetime
 
 from enum import Enum
 
+from app.services.EmbeddingService import EmbeddingService
+from app.services.TokenizerService import TokenizerService
+from app.utils.chroma_client import create_chroma_client
+from app.utils.lru_cache import LRUCache
+
 class DocumentType(Enum):
     KEYWORDS = "KEYWORDS"
     SUMMARY = "SUMMARY"
+    # keywords and summary of one combined request, as JSON object
+    ENRICHMENT = "ENRICHMENT"
 
 class MediaService:
-    if os.getenv('IS_DOCKER') == "true":
-        client = chromadb.HttpClient(host="chromadb", port=8000)
-    else:
-        client = chromadb.HttpClient(host="localhost", port=8000)
+    # http, persistent (embedded) or memory, selected with CHROMA_BACKEND
+    client = create_chroma_client()
+
+    bulk_chunk_size = 100
+
+    # IDs by collection that a store_articles call has claimed but not written yet,
+    # so concurrent ingestions of the same article store and report it only once
+    claimed_ids = {}
+    claimed_ids_lock = threading.Lock()
+
+    # embeddings are computed and cached on our side, disable for collections with an own embedding function
+    use_embedding_service = True
+    embeddingservice = EmbeddingService()
+
+    # resolved collection handles by name, shared by all instances so hot paths skip the lookup round trip
+    collection_cache_ttl = 300
+    collection_cache = {}
+    collection_cache_lock = threading.Lock()
+
+    # results of get_articles_by_date by (collection, query, n_results, start, end), dropped on every write
+    query_cache = LRUCache(max_entries=256, ttl=600)
 
     def store_article(self, collection_name, article: dict):
         """
-                Store a single article in the specified collection.
+                Store a single article in the specified collection, replacing a stored copy of the same article.
 
                 Parameters:
                     collection_name (str): The name of the collection.
                     article (dict): The article to store, including content and metadata.
 
                 Returns:
-                    str: The generated ID of the stored article.
+                    str: The ID of the stored article.
         """
         content = article.get("content")
         metadata = article.get("metadata")
         collection = self.get_collection(collection_name)
-        ids = []
-        availability = False
+        generated_id = self.generate_article_id(article)
 
-        while not availability:
-            generated_id = str(uuid.uuid4())
-            availability = self.__is_id_available(generated_id, collection)
-
-        collection.add(
-            documents=content,
-            metadatas=metadata,
-            ids=generated_id
+        collection.upsert(
+            documents=[content],
+            embeddings=self.__embed([content]),
+            metadatas=[metadata],
+            ids=[generated_id]
         )
+        self.invalidate_query_cache(collection_name)
         return generated_id
 
     def store_multiple_articles(self, collection_name, articles):
         """
-                Store multiple articles in the specified collection.
+                Store multiple articles in the specified collection, replacing stored copies of the same articles.
 
                 Parameters:
                     collection_name (str): The name of the collection.
@@ -55,27 +77,87 @@ class MediaService:
                 Returns:
                     None
         """
-        contents = [article["content"] for article in articles]
-        metadata = [article["metadata"] for article in articles]
+        #the same article twice in one request would be rejected by chroma, the last one wins
+        unique_articles = {self.generate_article_id(article): article for article in articles}
         collection = self.get_collection(collection_name)
-        ids = []
-
-        #creates for every document a id and checks if available or not
-        for article in articles:
-            availability = False
-            generated_id = ""
-            while not availability:
-                generated_id = str(uuid.uuid4())
-                availability = self.__is_id_available(generated_id, collection)
-                print(availability)
-
-            ids.append(generated_id)
-
-        collection.add(
-            documents=contents,
-            metadatas=metadata,
-            ids=ids
+
+        documents = [article["content"] for article in unique_articles.values()]
+        collection.upsert(
+            documents=documents,
+            embeddings=self.__embed(documents),
+            metadatas=[article["metadata"] for article in unique_articles.values()],
+            ids=list(unique_articles.keys())
         )
+        self.invalidate_query_cache(collection_name)
+
+    def store_articles(self, collection_name, articles, chunk_size: int = None):
+        """
+                Store many articles in the specified collection with one write per chunk.
+
+                Articles that are already stored are skipped, so ingesting the same page again
+                neither duplicates them nor overwrites their summary and keywords.
+
+                Parameters:
+                    collection_name (str): The name of the collection.
+                    articles (list[dict]): The articles to store, each including content and metadata.
+                    chunk_size (int): The number of articles written per write (default: bulk_chunk_size).
+
+                Returns:
+                    list: The IDs of the newly stored articles.
+        """
+        chunk_size = chunk_size or self.bulk_chunk_size
+        collection = self.get_collection(collection_name)
+        stored_ids = []
+
+        for start in range(0, len(articles), chunk_size):
+            chunk = {self.generate_article_id(article): article for article in articles[start:start + chunk_size]}
+
+            #the check and the claim are atomic, the embedding and the write run outside of the lock
+            with self.claimed_ids_lock:
+                claimed_ids = self.claimed_ids.setdefault(collection_name, set())
+                existing_ids = set(collection.get(ids=list(chunk.keys()), include=[]).get("ids"))
+                new_articles = {article_id: article for article_id, article in chunk.items()
+                                if article_id not in existing_ids and article_id not in claimed_ids}
+                claimed_ids.update(new_articles.keys())
+
+            if not new_articles:
+                continue
+
+            try:
+                documents = [article.get("content") for article in new_articles.values()]
+                collection.upsert(
+                    documents=documents,
+                    embeddings=self.__embed(documents),
+                    metadatas=[article.get("metadata") for article in new_articles.values()],
+                    ids=list(new_articles.keys())
+                )
+            finally:
+                #once written, the articles are found by the check, if the write failed they can be claimed again
+                with self.claimed_ids_lock:
+                    claimed_ids.difference_update(new_articles.keys())
+
+            stored_ids.extend(new_articles.keys())
+
+        if stored_ids:
+            self.invalidate_query_cache(collection_name)
+        return stored_ids
+
+    @staticmethod
+    def generate_article_id(article: dict):
+        """
+                Derive a stable ID from the URL of an article, or from its title and date if it has no URL.
+
+                Parameters:
+                    article (dict): The article, including its metadata.
+
+                Returns:
+                    str: The ID of the article.
+        """
+        metadata = article.get("metadata") or {}
+        if metadata.get("url"):
+            return str(uuid.uuid5(uuid.NAMESPACE_URL, metadata.get("url")))
+
+        return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{metadata.get('title')}|{metadata.get('published')}"))
 
     def get_articles(self, number_of_articles, query, collection_name="articles"):
         """
@@ -92,7 +174,7 @@ class MediaService:
         collection = self.get_collection(collection_name)
 
         return collection.query(
-            query_texts=[query],
+            **self.__get_query_arguments(query),
             n_results=number_of_articles,
         )
 
@@ -110,20 +192,29 @@ class MediaService:
                Returns:
                    list: A list of articles matching the query and date range.
         """
+        cache_key = (collection_name, query, number_of_articles, start_date, end_date)
+        articles = self.query_cache.get(cache_key)
+        if articles is not None:
+            #callers modify the result, so every caller gets its own copy
+            return copy.deepcopy(articles)
+
         collection = self.get_collection(collection_name)
 
         try:
-            return collection.query(
-                query_texts=[query],
+            articles = collection.query(
+                **self.__get_query_arguments(query),
                 n_results=number_of_articles,
                 where={"$and":[{"date_count": {"$gte": start_date}}, {"date_count": {"$lt": end_date}}]}
             )
         except Exception as e:
             return "Tell the user that something is wrong with the provided date or that a date is missing"
 
+        self.query_cache.set(cache_key, copy.deepcopy(articles))
+        return articles
+
     def get_collection(self, collection_name):
         """
-        Get the specified collection.
+        Get the specified collection, reusing its handle for collection_cache_ttl seconds.
 
         Parameters:
             collection_name (str): The name of the collection.
@@ -131,7 +222,33 @@ class MediaService:
         Returns:
             Collection: The specified collection.
         """
-        return self.client.get_collection(name=collection_name)
+        now = time.monotonic()
+        with self.collection_cache_lock:
+            cached = self.collection_cache.get(collection_name)
+            if cached is not None and now - cached[1] < self.collection_cache_ttl:
+                return cached[0]
+
+        collection = self.client.get_collection(name=collection_name)
+
+        with self.collection_cache_lock:
+            self.collection_cache[collection_name] = (collection, now)
+        return collection
+
+    def invalidate_collection(self, collection_name=None):
+        """
+        Remove a collection, or all collections, from the collection handle cache.
+
+        Parameters:
+            collection_name (str): The name of the collection, None for all collections.
+
+        Returns:
+            None
+        """
+        with self.collection_cache_lock:
+            if collection_name is None:
+                self.collection_cache.clear()
+            else:
+                self.collection_cache.pop(collection_name, None)
 
     def update_collection(self, collection_name, document_id: str, type: DocumentType, content: str):
         """
@@ -149,11 +266,73 @@ class MediaService:
         collection = self.get_collection(collection_name)
         print(collection.id)
         if type == DocumentType.SUMMARY:
-            collection.update(ids=document_id, documents=content)
+            collection.update(ids=[document_id], documents=[content], embeddings=self.__embed([content]))
         else:
             metadata = self.get_article_by_id(collection, document_id).get("metadatas")[0]
             metadata["keywords"] = content
             collection.update(ids=document_id, metadatas=metadata)
+        self.invalidate_query_cache(collection_name)
+
+    def update_documents(self, collection_name, type: DocumentType, contents: dict, chunk_size: int = None):
+        """
+                Update many documents in the specified collection with one update per chunk.
+
+                Parameters:
+                    collection_name (str): The name of the collection.
+                    type (DocumentType): The type of document (KEYWORDS, SUMMARY or ENRICHMENT).
+                    contents (dict): The new content of every document, by document ID. For ENRICHMENT a JSON
+                                     object with keywords and summary.
+                    chunk_size (int): The number of documents updated per update (default: bulk_chunk_size).
+
+                Returns:
+                    list: The IDs of the documents that were updated, invalid enrichments are left out.
+        """
+        chunk_size = chunk_size or self.bulk_chunk_size
+        collection = self.get_collection(collection_name)
+        document_ids = list(contents.keys())
+        updated_ids = []
+
+        for start in range(0, len(document_ids), chunk_size):
+            chunk_ids = document_ids[start:start + chunk_size]
+
+            if type == DocumentType.SUMMARY:
+                documents = [contents[document_id] for document_id in chunk_ids]
+                collection.update(ids=chunk_ids, documents=documents, embeddings=self.__embed(documents))
+                updated_ids.extend(chunk_ids)
+                continue
+
+            #keywords are merged into the existing metadata, which is fetched once for the whole chunk
+            stored = collection.get(ids=chunk_ids, include=["metadatas"])
+
+            if type == DocumentType.KEYWORDS:
+                for metadata, document_id in zip(stored.get("metadatas"), stored.get("ids")):
+                    metadata["keywords"] = contents[document_id]
+
+                if stored.get("ids"):
+                    collection.update(ids=stored.get("ids"), metadatas=stored.get("metadatas"))
+                    updated_ids.extend(stored.get("ids"))
+                continue
+
+            #keywords and summary of a document are written together in one update
+            ids, documents, metadatas = [], [], []
+            for metadata, document_id in zip(stored.get("metadatas"), stored.get("ids")):
+                enrichment = self.__parse_enrichment(contents[document_id])
+                if enrichment is None:
+                    print(f"Invalid enrichment for document {document_id}: {contents[document_id]}")
+                    continue
+
+                metadata["keywords"] = enrichment.get("keywords")
+                ids.append(document_id)
+                documents.append(enrichment.get("summary"))
+                metadatas.append(metadata)
+
+            if ids:
+                collection.update(ids=ids, documents=documents, embeddings=self.__embed(documents),
+                                  metadatas=metadatas)
+                updated_ids.extend(ids)
+
+        self.invalidate_query_cache(collection_name)
+        return updated_ids
 
     def create_collection(self, collection_name, embedding_function):
         """
@@ -166,8 +345,48 @@ class MediaService:
                 Returns:
                     Collection: The created collection.
         """
+        self.invalidate_collection(collection_name)
+        self.invalidate_query_cache(collection_name)
         return self.client.create_collection(name=collection_name, embedding_function=embedding_function)
 
+    def delete_collection(self, collection_name):
+        """
+                Delete a collection.
+
+                Parameters:
+                    collection_name (str): The name of the collection.
+
+                Returns:
+                    None
+        """
+        self.invalidate_collection(collection_name)
+        self.invalidate_query_cache(collection_name)
+        self.client.delete_collection(name=collection_name)
+
+    def invalidate_query_cache(self, collection_name=None):
+        """
+        Remove the cached query results of a collection, or of all collections.
+
+        Parameters:
+            collection_name (str): The name of the collection, None for all collections.
+
+        Returns:
+            None
+        """
+        if collection_name is None:
+            self.query_cache.invalidate()
+        else:
+            self.query_cache.invalidate(lambda key: key[0] == collection_name)
+
+    def get_query_cache_stats(self):
+        """
+        Get the size and the hit/miss counters of the query result cache.
+
+        Returns:
+            dict: The number of cached results, hits and misses.
+        """
+        return self.query_cache.stats()
+
     def get_article_by_id(self, collection, id):
         """
                 Get an article by its ID.
@@ -191,55 +410,18 @@ class MediaService:
                 Returns:
                     int: The number of tokens in the article.
         """
-        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo-0125")
-        tokens = encoding.encode(article)
-        return len(tokens)
-
-    def update_date_counts_all_articles(self, collection):
-        """
-               Update the date counts for all articles in the collection.
+        return TokenizerService().count_tokens(article)
 
-               Parameters:
-                   collection (Collection): The collection to update.
-
-               Returns:
-                   None
+    def filter_documents_by_time_interval(self, articles, lower_boundary, upper_boundary, articles_per_bucket=1):
         """
-        start_date_str = "2010-01-01"
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-
-        for i in range(0, 1000, 1):
-            try:
-                batch = collection.get(
-                    include=["metadatas", "documents"],
-                    limit=1,
-                    offset=i)
-
-                batch = dict(batch)
-
-                article_date_str = batch["metadatas"][0]["published"]
-                article_date = datetime.strptime(article_date_str, "%Y-%m-%d").date()
-
-                date_count = article_date - start_date
-                batch["metadatas"][0]["date_count"] = date_count.days
-
-                collection.update(
-                    ids=batch["ids"],
-                    metadatas=batch["metadatas"]
-                )
-
-            except KeyError:
-                continue
-        print("all texts were successfully updated.")
-
-    def filter_documents_by_time_interval(self, articles, lower_boundary, upper_boundary):
-        """
-                Filter documents by a specified time interval.
+                Sample documents over a time interval: the interval is split into buckets of equal length
+                and only the closest articles to the query are kept in every bucket.
 
                 Parameters:
-                    articles (dict): The articles to filter.
+                    articles (dict): The articles to filter, as returned by a query.
                     lower_boundary (int): The lower boundary of the time interval.
                     upper_boundary (int): The upper boundary of the time interval.
+                    articles_per_bucket (int): The number of articles kept per bucket (default: 1).
 
                 Returns:
                     dict: The filtered articles.
@@ -260,49 +442,86 @@ class MediaService:
                 return 8
 
         metadatas = articles.get("metadatas")[0]
-        texts = articles.get("documents")[0]
+        distances = articles.get("distances")[0] if articles.get("distances") else None
 
         days_difference = upper_boundary - lower_boundary
         time_step = calculate_time_step(days_difference)
 
-        # is for checking whether the date is already chosen
-        existing_dates = []
+        # one heap per bucket with the (negated) distances of the kept articles, the worst one on top
+        buckets = [[] for _ in range(days_difference // time_step + 1)]
 
-        indices_to_remove = []
+        for index, metadata in enumerate(metadatas):
+            published_date = metadata.get('date_count')
+            if published_date is None or not lower_boundary <= published_date <= upper_boundary:
+                continue
 
-        for index, (text, metadata) in enumerate(zip(texts, metadatas)):
-            published_date = metadata['date_count']
+            bucket = buckets[(published_date - lower_boundary) // time_step]
+            # without distances the query order is the ranking
+            distance = distances[index] if distances is not None else index
 
-            # if it does not comply, it is thrown out
-            if (published_date - lower_boundary) % time_step == 0:
-                # if it's already in, it is thrown out
-                if published_date not in existing_dates:
-                    existing_dates.append(published_date)
-                else:
-                    indices_to_remove.append(index)
-            else:
-                indices_to_remove.append(index)
+            if len(bucket) < articles_per_bucket:
+                heapq.heappush(bucket, (-distance, index))
+            elif -bucket[0][0] > distance:
+                heapq.heapreplace(bucket, (-distance, index))
 
-        for index in sorted(indices_to_remove, reverse=True):
-            del metadatas[index]
-            del texts[index]
+        # the kept articles stay in the order of the query
+        kept_indices = sorted(index for bucket in buckets for _, index in bucket)
 
-        articles["documents"][0] = texts
-        articles["metadatas"][0] = metadatas
+        for key in ["ids", "documents", "metadatas", "distances", "embeddings", "uris", "data"]:
+            if articles.get(key):
+                values = articles[key][0]
+                articles[key][0] = [values[index] for index in kept_indices]
 
         return articles
 
-    def __is_id_available(self, article_id, collection):
+    def __embed(self, documents: list):
         """
-                Check if a generated ID is available in the collection.
+                Get the embeddings of documents from the embedding service.
 
                 Parameters:
-                    article_id (str): The generated ID to check.
-                    collection (Collection): The collection to check against.
+                    documents (list[str]): The documents to embed.
 
                 Returns:
-                    bool: True if the ID is available, False otherwise.
-            """
-        if collection.get(article_id).get("data") is None:
-            return True
-        return False
+                    list: The embeddings, or None if chroma computes them itself.
+        """
+        if not self.use_embedding_service:
+            return None
+        return self.embeddingservice.embed_documents(documents)
+
+    def __get_query_arguments(self, query: str):
+        """
+                Get the arguments of a collection query for a query text.
+
+                Parameters:
+                    query (str): The query text.
+
+                Returns:
+                    dict: The cached query embedding, or the query text if chroma computes the embedding itself.
+        """
+        if not self.use_embedding_service:
+            return {"query_texts": [query]}
+        return {"query_embeddings": [self.embeddingservice.embed_query(query)]}
+
+    def __parse_enrichment(self, content):
+        """
+                Parse the keywords and the summary of a combined enrichment.
+
+                Parameters:
+                    content (str | dict): The enrichment as JSON object, or already parsed.
+
+                Returns:
+                    dict: The keywords and the summary as strings, or None if the enrichment is invalid.
+        """
+        try:
+            enrichment = json.loads(content) if isinstance(content, str) else content
+        except json.JSONDecodeError:
+            return None
+
+        if not isinstance(enrichment, dict) or not enrichment.get("summary"):
+            return None
+
+        keywords = enrichment.get("keywords") or ""
+        if isinstance(keywords, list):
+            keywords = ", ".join(str(keyword) for keyword in keywords)
+
+        return {"keywords": str(keywords), "summary": str(enrichment.get("summary"))}
@@ -0,0 +1,114 @@
+import json
+import os
+
+from app.services.MediaService import MediaService
+from app.utils.metadata_transforms import date_count_transform
+
+
+class MigrationService:
+    mediaservice = MediaService()
+    default_page_size = 500
+
+    # name -> function that receives the metadata of a document and returns the updated metadata,
+    # or None if the document stays unchanged
+    transforms = {
+        "date_count": date_count_transform
+    }
+
+    def register_transform(self, name: str, transform):
+        """
+                Register a metadata transform, so it can be run by its name.
+
+                Parameters:
+                    name (str): The name of the transform.
+                    transform (callable): The function that transforms the metadata of a document.
+
+                Returns:
+                    None
+        """
+        self.transforms[name] = transform
+
+    def run(self, collection_name: str, transform_name: str, page_size: int = None, resume: bool = True):
+        """
+                Apply a metadata transform to every document of a collection, page by page with one update per page.
+                The offset of the next page is saved after every page, so an interrupted migration can be resumed.
+
+                Parameters:
+                    collection_name (str): The name of the collection.
+                    transform_name (str): The name of the registered transform.
+                    page_size (int): The number of documents per page (default: default_page_size).
+                    resume (bool): Whether to continue at the saved offset of an interrupted run (default: True).
+
+                Returns:
+                    dict: The number of processed pages, documents and updated documents.
+        """
+        if transform_name not in self.transforms:
+            raise ValueError(f"Unknown transform: {transform_name}")
+
+        transform = self.transforms[transform_name]
+        page_size = page_size or self.default_page_size
+        collection = self.mediaservice.get_collection(collection_name)
+        checkpoint = f"migration_{collection_name}_{transform_name}.json"
+
+        offset = self.__load_offset(checkpoint) if resume else 0
+        pages = 0
+        updated_documents = 0
+
+        while True:
+            page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not page.get("ids"):
+                break
+
+            ids, metadatas = [], []
+            for document_id, metadata in zip(page.get("ids"), page.get("metadatas")):
+                transformed = transform(dict(metadata or {}))
+                if transformed is not None:
+                    ids.append(document_id)
+                    metadatas.append(transformed)
+
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+
+            pages += 1
+            updated_documents += len(ids)
+            offset += len(page.get("ids"))
+            self.__save_offset(checkpoint, offset)
+
+        if updated_documents:
+            self.mediaservice.invalidate_query_cache(collection_name)
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        print(f"Migration '{transform_name}' of '{collection_name}' finished: {updated_documents} of {offset} "
+              f"documents updated.")
+
+        return {"pages": pages, "documents": offset, "updated_documents": updated_documents}
+
+    def __load_offset(self, checkpoint: str):
+        """
+                Load the offset an interrupted migration stopped at.
+
+                Parameters:
+                    checkpoint (str): The path of the checkpoint file.
+
+                Returns:
+                    int: The saved offset, 0 if there is none.
+        """
+        if not os.path.exists(checkpoint):
+            return 0
+
+        with open(checkpoint, "r") as file:
+            return json.load(file).get("offset", 0)
+
+    def __save_offset(self, checkpoint: str, offset: int):
+        """
+                Save the offset of the next page.
+
+                Parameters:
+                    checkpoint (str): The path of the checkpoint file.
+                    offset (int): The offset of the next page.
+
+                Returns:
+                    None
+        """
+        with open(checkpoint, "w") as file:
+            json.dump({"offset": offset}, file)
@@ -0,0 +1,87 @@
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.rate_limiter import TokenBucket
+
+
+class NewsApiClient:
+    retry_status_codes = {429, 500, 502, 503, 504}
+
+    def __init__(self, url: str, headers: dict, requests_per_second: float = 5, max_retries: int = 4,
+                 timeout: float = 30, backoff_base: float = 0.5, backoff_cap: float = 30, pool_size: int = 8):
+        """
+                Create a client for the News API.
+
+                Parameters:
+                    url (str): The url of the News API, e.g. a local stub server for testing.
+                    headers (dict): The headers sent with every request.
+                    requests_per_second (float): The maximum rate of requests of this process.
+                    max_retries (int): The number of retries after a 429, 5xx or connection error.
+                    timeout (float): The timeout of a single request in seconds.
+                    backoff_base (float): The backoff before the first retry in seconds.
+                    backoff_cap (float): The maximum backoff between two retries in seconds.
+                    pool_size (int): The number of keep-alive connections kept open.
+        """
+        self.url = url
+        self.headers = headers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.token_bucket = TokenBucket(requests_per_second)
+
+        # one keep-alive session per client, so consecutive requests reuse the same connections
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post(self, payload: dict):
+        """
+                Send a request to the News API, respecting the rate limit and retrying on transient errors.
+
+                Parameters:
+                    payload (dict): The JSON payload of the request.
+
+                Returns:
+                    dict: The response from the News API as a JSON object.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.token_bucket.acquire()
+            try:
+                response = self.session.post(self.url, json=payload, headers=self.headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"News API request failed: {e}"
+                retry_after = None
+            else:
+                if response.ok:
+                    return response.json()
+                if response.status_code not in self.retry_status_codes:
+                    raise RuntimeError(f"News API request failed with status {response.status_code}: {response.text}")
+
+                error = f"News API request failed with status {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+
+            if attempt < self.max_retries:
+                time.sleep(self.__get_backoff(attempt, retry_after))
+
+        raise RuntimeError(f"{error} after {self.max_retries + 1} attempts")
+
+    def __get_backoff(self, attempt: int, retry_after: str = None):
+        """
+                Get the time to wait before the next retry, using full jitter.
+
+                Parameters:
+                    attempt (int): The number of the failed attempt, starting at 0.
+                    retry_after (str): The value of the Retry-After header of the response, if given.
+
+                Returns:
+                    float: The seconds to wait.
+        """
+        if retry_after is not None and retry_after.isdigit():
+            return min(self.backoff_cap, float(retry_after))
+
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
@@ -1,7 +1,10 @@
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
-import requests
 import yaml
+from app.services.NewsApiClient import NewsApiClient
+from app.utils.disk_cache import DiskCache
 from app.services.OpenAIService import OpenAIService
 from app.services.MediaService import MediaService
 
@@ -9,26 +12,44 @@ class NewsApiService:
     url = "https://newsnow.p.rapidapi.com/newsv2"
     config = yaml.safe_load(open("openai_config.yaml"))
 
-    def get_articles(self, topic: str, page_number: int, start_date: str, end_date: str):
+    max_pages_in_flight = 4
+    page_limit = 10
+    requests_per_second = 5
+
+    # shared by all requests of the process, so the rate limit holds across concurrent ingestions
+    client = NewsApiClient(
+        url,
+        headers={
+            "x-rapidapi-key": config["KEYS"]["rapid-api"],
+            "x-rapidapi-host": "newsnow.p.rapidapi.com",
+            "Content-Type": "application/json"
+        },
+        requests_per_second=requests_per_second,
+        pool_size=max_pages_in_flight * 2
+    )
+
+    # pages of finished months never change and are kept forever, pages of recent dates expire after cache_ttl
+    cache_enabled = True
+    cache_ttl = 6 * 60 * 60
+    cache_max_bytes = 512 * 1024 * 1024
+    response_cache = DiskCache("news_api_cache.db", ttl=cache_ttl, max_bytes=cache_max_bytes)
+
+    def get_articles(self, topic: str, page_number: int, start_date: str, end_date: str, use_cache: bool = True):
         """
                 Get articles from the News API based on the provided topic and date range.
+                Responses are served from the response cache if possible.
 
                 Parameters:
                     topic (str): The topic to search for.
                     page_number (int): The page number to retrieve.
                     start_date (str): The start date for the search (DD/MM/YYYY).
                     end_date (str): The end date for the search (DD/MM/YYYY).
+                    use_cache (bool): Whether the response cache is used (default: True).
 
                 Returns:
                     dict: The response from the News API as a JSON object.
         """
         # date format is DD/MM/YYYY
-        headers = {
-            "x-rapidapi-key": self.config["KEYS"]["rapid-api"],
-            "x-rapidapi-host": "newsnow.p.rapidapi.com",
-            "Content-Type": "application/json"
-        }
-
         #maybe test with variable amount of pages
         payload = {
             "query": topic,
@@ -39,8 +60,60 @@ class NewsApiService:
             "language": "de",
             "page": page_number
         }
-        response = requests.post(self.url, json=payload, headers=headers)
-        return response.json()
+        if not use_cache or not self.cache_enabled:
+            return self.client.post(payload)
+
+        cache_key = DiskCache.make_key(payload)
+        response = self.response_cache.get(cache_key)
+        if response is None:
+            response = self.client.post(payload)
+            self.response_cache.set(cache_key, response, self.__get_cache_ttl(end_date))
+        return response
+
+    def get_all_articles(self, topic: str, first_page: int, start_date: str, end_date: str,
+                         max_in_flight: int = None):
+        """
+                Get all pages of articles for a topic and date range, fetching several pages concurrently.
+
+                Pages are yielded in order. The iteration stops at the first page with a count of 0,
+                pages that were requested ahead of it are discarded.
+
+                Parameters:
+                    topic (str): The topic to search for.
+                    first_page (int): The page number to start with.
+                    start_date (str): The start date for the search (DD/MM/YYYY).
+                    end_date (str): The end date for the search (DD/MM/YYYY).
+                    max_in_flight (int): The maximum number of pages requested at the same time.
+
+                Returns:
+                    generator: Tuples of page number and the response of the News API.
+        """
+        max_in_flight = max(1, max_in_flight or self.max_pages_in_flight)
+        next_page = first_page
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+            def submit_next_page():
+                nonlocal next_page
+                if next_page >= self.page_limit:
+                    return
+                future = executor.submit(self.get_articles, topic, next_page, start_date, end_date)
+                pending.append((next_page, future))
+                next_page += 1
+
+            for _ in range(max_in_flight):
+                submit_next_page()
+
+            while pending:
+                page_number, future = pending.popleft()
+                response = future.result()
+                if response.get("count") == 0:
+                    for _, remaining in pending:
+                        remaining.cancel()
+                    return
+
+                yield page_number, response
+                submit_next_page()
 
     def transform_article(self, article, text="", keywords=""):
         """
@@ -74,6 +147,26 @@ class NewsApiService:
         }
         return transformed_article
 
+    def __get_cache_ttl(self, end_date: str):
+        """
+                Get the TTL of a cached response, depending on whether the requested date range is finished.
+
+                Parameters:
+                    end_date (str): The end date of the search (DD/MM/YYYY).
+
+                Returns:
+                    float: The TTL in seconds, or None if the response never expires.
+        """
+        try:
+            requested_end = datetime.strptime(end_date, "%d/%m/%Y")
+        except ValueError:
+            return self.cache_ttl
+
+        # new articles can still show up for a few days after they were published
+        if requested_end < datetime.now() - timedelta(days=3):
+            return None
+        return self.cache_ttl
+
     #transforms a date to the format YYYY-MM-DD
     def __transform_date(self, date: str):
         """
@@ -4,19 +4,38 @@ import subprocess
 import threading
 import time
 import re
-import ast
 from datetime import datetime
 
 import yaml
 from openai import OpenAI
-import concurrent.futures
+from app.services.AnalysisService import AnalysisService
 from app.services.MediaService import MediaService, DocumentType
+from app.services.TokenizerService import TokenizerService
+from app.utils.assistant_registry import AssistantRegistry
+from app.utils.analysis_utils import extract_analysis_results
+from app.utils.partitioning import partition_by_token_budget
 
 
 class OpenAIService:
     config = yaml.safe_load(open("openai_config.yaml"))
     client = OpenAI(api_key=config['KEYS']['openai'])
 
+    # articles are cut to this budget before they go into an analysis prompt
+    max_article_tokens = 800
+
+    # articles are packed into partitions of about this many tokens, one model request per partition
+    partition_token_budget = 3000
+
+    # runs are polled quickly first and then less often, until they reach a terminal status or the deadline
+    run_poll_initial_interval = 0.2
+    run_poll_max_interval = 2
+    run_poll_backoff = 1.5
+    run_timeout = 120
+    run_terminal_statuses = ["completed", "failed", "cancelled", "expired", "incomplete"]
+
+    # the assistant is created once per configuration and reused by every instance, process and restart
+    assistant_registry = AssistantRegistry("assistant_registry.db", client)
+
     def __init__(self):
         tools = [{
             "type": "function",
@@ -40,8 +59,8 @@ class OpenAIService:
                         },
                         "time_period": {
                             "type": "string",
-                            "description": "the time period to be taken into account when the current date is " + time.strftime(
-                                "%Y-%m-%d") + ", in the format YYYY-MM-DD:YYYY-MM-DD"
+                            "description": "the time period to be taken into account when the current date is the one given "
+                                           "in the instructions, in the format YYYY-MM-DD:YYYY-MM-DD"
                         },
                         "sentiment_categories": {
                             "type": "array",
@@ -57,7 +76,8 @@ class OpenAIService:
             }
         }]
 
-        self.assistant = self.client.beta.assistants.create(
+        #the current date is part of the run instructions and not of the tools, so the assistant stays the same
+        self.assistant_id = self.assistant_registry.get_assistant_id(
             name="Email Assistant",
             instructions="You are an assistant who has access to media articles that are about political topics.",
             tools=tools,
@@ -65,6 +85,7 @@ class OpenAIService:
         )
 
     mediaservice = MediaService()
+    analysisservice = AnalysisService()
 
     @staticmethod
     def solve_problem_parallelization(topic: str, user_prompt: str, chart_type: str, time_period: str,
@@ -129,32 +150,35 @@ class OpenAIService:
             articles = mediaservice.get_articles_by_date(int((upper_boundary-lower_boundary)*0.7), topic, lower_boundary, upper_boundary)
 
 
-        articles_without_date = articles.get("documents")[0]
-        for i in range(len(articles.get("metadatas")[0])):
-            articles_without_date[i] += " " + articles.get("metadatas")[0][i].get("published")
+        article_ids = articles.get("ids")[0]
+        published_dates = [metadata.get("published") for metadata in articles.get("metadatas")[0]]
 
-        articles_divided = OpenAIService.__divide_lists(articles_without_date, int(len(articles.get("documents")[0]) / 10))
+        tokenizerservice = TokenizerService()
+        articles_with_date = [
+            (article_ids[i], tokenizerservice.truncate(articles.get("documents")[0][i], OpenAIService.max_article_tokens)
+             + " " + published_dates[i])
+            for i in range(len(article_ids))]
 
-        results = []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=int(len(articles.get("documents")[0]) / 10)) as executor:
-            futures = [
-                executor.submit(openai_service.__process_article_list, article_list, user_prompt, sentiment_categories)
-                for
-                article_list in
-                articles_divided]
-            concurrent.futures.wait(futures)
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    result = future.result()
-                    results.append(result)
-                except Exception as exc:
-                    print(f"list of articles generated an exception: {exc}")
+        #only articles that were not analyzed with the same text for these categories and this prompt are sent to the model
+        sentiments = OpenAIService.analysisservice.get_cached_sentiments(articles_with_date, user_prompt,
+                                                                         sentiment_categories)
+        print(f"{len(sentiments)} of {len(article_ids)} sentiments were cached")
+
+        articles_to_analyze = [(article_id, text) for article_id, text in articles_with_date if article_id not in sentiments]
+
+        if articles_to_analyze:
+            token_counts = tokenizerservice.count_tokens_many([text for _, text in articles_to_analyze])
+            articles_divided = partition_by_token_budget(articles_to_analyze, token_counts,
+                                                         OpenAIService.partition_token_budget)
+
+            #the partitions are sent as concurrent chat completions, without thread and run polling per partition,
+            #at most AnalysisService.max_concurrency at the same time
+            sentiments.update(OpenAIService.analysisservice.analyze_partitions(articles_divided, user_prompt,
+                                                                               sentiment_categories))
 
-        flattened_results = []
         #combines the results for one final result
-        for sublist_str in results:
-            sublist = ast.literal_eval(sublist_str)
-            flattened_results.extend(sublist)
+        flattened_results = [(published_dates[i], sentiments[article_ids[i]])
+                             for i in range(len(article_ids)) if article_ids[i] in sentiments]
 
         request = ("Can you generate the directly executable python script for me to create a "
                    + chart_type + " with streamlit with a pattern like this, where you have a list of tuples: "
@@ -162,15 +186,17 @@ class OpenAIService:
                    )
 
         openai_service.send_message_to_thread(thread_id.id, request)
-        time.sleep(1)
 
         run = openai_service.execute_thread_without_function_calling(thread_id.id)
 
         #executes the code generation prompt
-        while run.status not in ['completed', 'failed']:
-            run = openai_service.retrieve_execution(thread_id.id, run.id)
-            print(run.status)
-            time.sleep(1)
+        try:
+            run = openai_service.wait_for_run(thread_id.id, run)
+        except TimeoutError:
+            return "Tell the user there was an issue with the request, try again"
+
+        if run.status != "completed":
+            return "Tell the user there was an issue with the request, try again"
 
         final_result = openai_service.retrieve_messages_from_thread(thread_id.id).data[0].content[0].text.value
         try:
@@ -217,40 +243,45 @@ class OpenAIService:
         if chart_type == "timeseries" or chart_type == "time series":
             articles = mediaservice.filter_documents_by_time_interval(articles, lower_boundary, upper_boundary)
 
+        tokenizerservice = TokenizerService()
         articles_without_date = articles.get("documents")[0]
         for i in range(len(articles.get("metadatas")[0])):
-            articles_without_date[i] += " " + articles.get("metadatas")[0][i].get("published")
+            articles_without_date[i] = (tokenizerservice.truncate(articles_without_date[i], OpenAIService.max_article_tokens)
+                                        + " " + articles.get("metadatas")[0][i].get("published"))
 
-        articles_divided = OpenAIService.__divide_lists(articles_without_date, 10)
+        articles_divided = partition_by_token_budget(articles_without_date,
+                                                     tokenizerservice.count_tokens_many(articles_without_date),
+                                                     OpenAIService.partition_token_budget)
 
         results = []
         for article_list in articles_divided:
-            result = openai_service.__process_article_list(article_list, user_prompt, sentiment_categories)
-            results.append(result)
+            #a partition whose run fails or does not finish in time is skipped
+            try:
+                result = openai_service.__process_article_list(article_list, user_prompt, sentiment_categories)
+                results.append(result)
+            except (RuntimeError, TimeoutError) as exc:
+                print(f"list of articles generated an exception: {exc}")
 
         request = "Can you generate the python code for me to create a " + chart_type + " with streamlit (make sure to flatten the lists) with the following data: " + "\n" + "\n".join(
             results)
 
         openai_service.send_message_to_thread(thread_id.id, request)
-        time.sleep(1)
 
         run = openai_service.execute_thread_without_function_calling(thread_id.id)
 
-        execution_counter = 0
-        while run.status not in ['completed', 'failed']:
-            execution_counter += 1
-            if execution_counter > 60:
-                return "There was an issue with your request, try again"
+        try:
+            run = openai_service.wait_for_run(thread_id.id, run, timeout=60)
+        except TimeoutError:
+            return "There was an issue with your request, try again"
 
-            run = openai_service.retrieve_execution(thread_id.id, run.id)
-            print(run.status)
-            time.sleep(1)
+        if run.status != "completed":
+            return "There was an issue with your request, try again"
 
         final_result = openai_service.retrieve_messages_from_thread(thread_id.id).data[0].content[0].text.value
 
         try:
-            extracted_code = OpenAIService.__extract_generated_code(final_result)
-            OpenAIService.__execute_generated_code(extracted_code)
+            extracted_code = OpenAIService.__extract_generated_code(final_result, results)
+            OpenAIService.__execute_generated_code()
         except RuntimeError as e:
             return "Something went wrong with the execution of the generated code"
 
@@ -298,8 +329,9 @@ class OpenAIService:
         """
         return self.client.beta.threads.runs.create(
             thread_id=thread_id,
-            assistant_id=self.assistant.id,
-            instructions="you are a sentiment-analyst, I give you text wrapped in quotes on a topic and you analyze it"
+            assistant_id=self.assistant_id,
+            instructions="you are a sentiment-analyst, I give you text wrapped in quotes on a topic and you analyze it",
+            additional_instructions="The current date is " + time.strftime("%Y-%m-%d") + "."
         )
 
     def execute_thread_without_function_calling(self, thread_id):
@@ -314,7 +346,7 @@ class OpenAIService:
         """
         return self.client.beta.threads.runs.create(
             thread_id=thread_id,
-            assistant_id=self.assistant.id,
+            assistant_id=self.assistant_id,
             instructions="you are an analyst that does sentiment-analysis of media-articles, talk in a professional and reasoning way",
             tool_choice="none"
         )
@@ -332,6 +364,53 @@ class OpenAIService:
         """
         return self.client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
 
+    def wait_for_run(self, thread_id, run, on_requires_action=None, timeout: float = None):
+        """
+                Wait until a run reaches a terminal status, polling with exponential backoff.
+
+                The time spent in on_requires_action does not count towards the deadline.
+                When the deadline is reached, the run is cancelled and a TimeoutError is raised.
+
+                Parameters:
+                    thread_id (str): The ID of the thread.
+                    run (Run): The run to wait for.
+                    on_requires_action (callable): Called with the run when it requires an action,
+                        returns the updated run (default: None, the run is returned as it is).
+                    timeout (float): The seconds to wait at most (default: run_timeout).
+
+                Returns:
+                    Run: The run in its last status.
+        """
+        deadline = time.monotonic() + (timeout or self.run_timeout)
+        interval = self.run_poll_initial_interval
+
+        while run.status not in self.run_terminal_statuses:
+            if run.status == "requires_action":
+                if on_requires_action is None:
+                    return run
+
+                action_start = time.monotonic()
+                run = on_requires_action(run)
+                deadline += time.monotonic() - action_start
+                interval = self.run_poll_initial_interval
+                continue
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                try:
+                    self.client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                except Exception as e:
+                    print(f"Run {run.id} could not be cancelled: {e}")
+                raise TimeoutError(f"Run {run.id} did not finish in time, last status: {run.status}")
+
+            time.sleep(min(interval, remaining))
+            interval = min(interval * self.run_poll_backoff, self.run_poll_max_interval)
+
+            run = self.retrieve_execution(thread_id, run.id)
+            print(run.status)
+
+        return run
+
     def retrieve_messages_from_thread(self, thread_id):
         """
                 Retrieve messages from a thread.
@@ -399,71 +478,33 @@ class OpenAIService:
         )
 
         self.send_message_to_thread(thread.id, request)
-        time.sleep(1)
         run = self.execute_thread_without_function_calling(thread.id)
-
-        while run.status not in ['completed', 'failed']:
-            run = self.retrieve_execution(thread.id, run.id)
-            print(run.status)
-            time.sleep(1)
+        run = self.wait_for_run(thread.id, run)
+        if run.status != "completed":
+            raise RuntimeError(f"Run {run.id} of the sub-result ended with status {run.status}")
 
         result = self.retrieve_messages_from_thread(thread.id).data[0].content[0].text.value
-        extracted_result = OpenAIService.__extract_analysis_results(result)
+        extracted_result = extract_analysis_results(result)
 
         #if the extracted result is bad and the model doesnt give us the result we ask why
         if (len(extracted_result) == 0):
             #this prompt mostly solves the problem, the gpt-model-3.5 seems sometimes a little confused with these types of tasks
-            self.send_message_to_thread(thread, "why not? Just use the provided texts by me")
-            time.sleep(1)
+            self.send_message_to_thread(thread.id, "why not? Just use the provided texts by me")
             run = self.execute_thread_without_function_calling(thread.id)
+            run = self.wait_for_run(thread.id, run)
 
-            while run.status not in ['completed', 'failed']:
-                run = self.retrieve_execution(thread.id, run.id)
-                print(run.status)
-                time.sleep(1)
+            #otherwise the first answer is kept
+            if run.status == "completed":
+                result = self.retrieve_messages_from_thread(thread.id).data[0].content[0].text.value
 
-            result = self.retrieve_messages_from_thread(thread.id).data[0].content[0].text.value
-
-        result = OpenAIService.__extract_analysis_results(result)
+        result = extract_analysis_results(result)
         #filter out the bad results that dont match the expected results
         filtered_result = [item for item in result if item[1].lower() in expected_categories]
 
         return str(filtered_result).lower()
 
-    def __divide_lists(dself, data: list, n: int) -> list[list]:
-        """
-        Split a list into n sublists of equal size.
-
-        Parameters:
-            data (list): The list to split.
-            n (int): The number of sublists to create.
-
-        Returns:
-            list: A list of sublists.
-        """
-        k, m = divmod(len(data), n)
-        return [data[i * k + min(i, m):(i + 1) * k + min(i + 1, m)] for i in range(n)]
-
-    def __extract_analysis_results(self, analysis: str):
-        """
-                Extract analysis results from a string.
-
-                Parameters:
-                    analysis (str): The analysis string.
-
-                Returns:
-                    list: A list of extracted results.
-        """
-        pattern = r'(\d{1,4}[-/]\d{1,2}[-/]\d{2}),\s*(\w+)'
-        matches = re.findall(pattern, analysis)
-
-        if len(matches) == 0:
-            pattern = r'(\d{1,4}[-/]\d{1,2}[-/]\d{2}):\s*(\w+)'
-            matches = re.findall(pattern, analysis)
-
-        return matches
-
-    def __extract_generated_code(self, request: str, data):
+    @staticmethod
+    def __extract_generated_code(request: str, data):
         """
                 Extract generated code from a request.
 
@@ -493,12 +534,10 @@ class OpenAIService:
         except Exception as e:
             raise RuntimeError("Error when extracting the generated code") from e
 
-    def __execute_generated_code(self):
+    @staticmethod
+    def __execute_generated_code():
         """
-                Execute the extracted code.
-
-                Parameters:
-                    extracted_code (str): The extracted code to execute.
+                Execute the extracted code, which is written to extracted_streamlit_app.py.
 
                 Returns:
                     None
@@ -529,7 +568,8 @@ class OpenAIService:
         except Exception as e:
             raise RuntimeError("Error when executing the code") from e
 
-    def __create_date_boundaries(self, time_period: str):
+    @staticmethod
+    def __create_date_boundaries(time_period: str):
         """
                 Create date boundaries from a time period string.
 
@@ -552,7 +592,8 @@ class OpenAIService:
 
         return lower_boundary.days, upper_boundary.days
 
-    def __check_date(self, time_period):
+    @staticmethod
+    def __check_date(time_period):
         """
             Check if the provided time period is valid.
 
@@ -0,0 +1,71 @@
+import threading
+
+import tiktoken
+
+
+class TokenizerService:
+    model = "gpt-3.5-turbo-0125"
+
+    # loading an encoding is expensive, so every encoding is only loaded once per process
+    encodings = {}
+    encodings_lock = threading.Lock()
+
+    def get_encoding(self, model: str = None):
+        """
+                Get the encoding of a model, loading it on first use.
+
+                Parameters:
+                    model (str): The name of the model (default: gpt-3.5-turbo-0125).
+
+                Returns:
+                    Encoding: The encoding of the model.
+        """
+        model = model or self.model
+        with self.encodings_lock:
+            if model not in self.encodings:
+                self.encodings[model] = tiktoken.encoding_for_model(model)
+            return self.encodings[model]
+
+    def count_tokens(self, text: str, model: str = None):
+        """
+                Count the number of tokens in a text.
+
+                Parameters:
+                    text (str): The text to count tokens in.
+                    model (str): The name of the model (default: gpt-3.5-turbo-0125).
+
+                Returns:
+                    int: The number of tokens in the text.
+        """
+        return len(self.get_encoding(model).encode(text, disallowed_special=()))
+
+    def count_tokens_many(self, texts: list, model: str = None):
+        """
+                Count the number of tokens of many texts at once.
+
+                Parameters:
+                    texts (list[str]): The texts to count tokens in.
+                    model (str): The name of the model (default: gpt-3.5-turbo-0125).
+
+                Returns:
+                    list: The number of tokens of every text, in the order of the texts.
+        """
+        return [len(tokens) for tokens in self.get_encoding(model).encode_batch(texts, disallowed_special=())]
+
+    def truncate(self, text: str, max_tokens: int, model: str = None):
+        """
+                Cut a text down to a maximum number of tokens.
+
+                Parameters:
+                    text (str): The text to truncate.
+                    max_tokens (int): The maximum number of tokens of the text.
+                    model (str): The name of the model (default: gpt-3.5-turbo-0125).
+
+                Returns:
+                    str: The text itself if it fits, otherwise its first max_tokens tokens.
+        """
+        encoding = self.get_encoding(model)
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens])
@@ -1,5 +1,41 @@
+import re
+
 
 def is_analysis_pending(run):
     if isinstance(run, dict):
         return True
     return False
+
+
+def extract_analysis_results(analysis: str):
+    """
+            Extract analysis results from a string.
+
+            Parameters:
+                analysis (str): The analysis string.
+
+            Returns:
+                list: A list of extracted (date, result) tuples.
+    """
+    pattern = r'(\d{1,4}[-/]\d{1,2}[-/]\d{2}),\s*(\w+)'
+    matches = re.findall(pattern, analysis)
+
+    if len(matches) == 0:
+        pattern = r'(\d{1,4}[-/]\d{1,2}[-/]\d{2}):\s*(\w+)'
+        matches = re.findall(pattern, analysis)
+
+    return matches
+
+
+def extract_numbered_results(analysis: str):
+    """
+            Extract the results of numbered articles from a string.
+
+            Parameters:
+                analysis (str): The analysis string, with lines like "3, positive".
+
+            Returns:
+                list: A list of extracted (number, result) tuples.
+    """
+    pattern = r'^\s*\[?(\d+)\]?\s*[,:.)-]\s*(\w+)'
+    return re.findall(pattern, analysis, re.MULTILINE)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from openai import NotFoundError, OpenAI
+
+
+class AssistantRegistry:
+    """
+    Persistent registry of the assistants created in the OpenAI Assistants API, stored in a SQLite file.
+
+    An assistant is identified by the fingerprint of its name, instructions, tools and model. The fingerprint
+    is also stored in the metadata of the assistant, so an assistant created by another process or on another
+    machine is found again instead of creating a new one.
+    """
+
+    def __init__(self, path: str, client: OpenAI):
+        self.path = path
+        self.client = client
+        self.lock = threading.Lock()
+
+        # assistants that were already looked up or created in this process
+        self.assistant_ids = {}
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS assistants ("
+            "fingerprint TEXT PRIMARY KEY, assistant_id TEXT NOT NULL, name TEXT, created_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def make_fingerprint(name: str, instructions: str, tools: list, model: str):
+        """
+        Get the fingerprint of an assistant configuration.
+
+        Parameters:
+            name (str): The name of the assistant.
+            instructions (str): The instructions of the assistant.
+            tools (list): The tools of the assistant.
+            model (str): The model of the assistant.
+
+        Returns:
+            str: The hash of the configuration.
+        """
+        configuration = {"name": name, "instructions": instructions, "tools": tools, "model": model}
+        return hashlib.sha256(json.dumps(configuration, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get_assistant_id(self, name: str, instructions: str, tools: list, model: str):
+        """
+        Get the ID of the assistant with this configuration, creating the assistant only if none exists yet.
+
+        The local registry is checked first, then the assistants of the account, before a new one is created.
+
+        Parameters:
+            name (str): The name of the assistant.
+            instructions (str): The instructions of the assistant.
+            tools (list): The tools of the assistant.
+            model (str): The model of the assistant.
+
+        Returns:
+            str: The ID of the assistant.
+        """
+        fingerprint = self.make_fingerprint(name, instructions, tools, model)
+
+        with self.lock:
+            if fingerprint in self.assistant_ids:
+                return self.assistant_ids[fingerprint]
+
+            assistant_id = self.__get_registered_id(fingerprint)
+            if assistant_id is None:
+                assistant_id = self.__find_remote_id(fingerprint)
+
+            if assistant_id is None:
+                assistant = self.client.beta.assistants.create(
+                    name=name,
+                    instructions=instructions,
+                    tools=tools,
+                    model=model,
+                    metadata={"fingerprint": fingerprint}
+                )
+                assistant_id = assistant.id
+                print(f"Created assistant {assistant_id} for {name}")
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO assistants (fingerprint, assistant_id, name, created_at) VALUES (?, ?, ?, ?)",
+                (fingerprint, assistant_id, name, time.time())
+            )
+            self.connection.commit()
+
+            self.assistant_ids[fingerprint] = assistant_id
+            return assistant_id
+
+    def __get_registered_id(self, fingerprint: str):
+        """
+        Get the ID of a registered assistant, if it still exists.
+
+        Parameters:
+            fingerprint (str): The fingerprint of the assistant configuration.
+
+        Returns:
+            str: The ID of the assistant or None.
+        """
+        row = self.connection.execute("SELECT assistant_id FROM assistants WHERE fingerprint = ?",
+                                      (fingerprint,)).fetchone()
+        if row is None:
+            return None
+
+        #the assistant could have been deleted in the meantime, this is only checked once per process
+        try:
+            self.client.beta.assistants.retrieve(row[0])
+        except NotFoundError:
+            self.connection.execute("DELETE FROM assistants WHERE fingerprint = ?", (fingerprint,))
+            self.connection.commit()
+            return None
+
+        return row[0]
+
+    def __find_remote_id(self, fingerprint: str):
+        """
+        Search the assistants of the account for one with the fingerprint in its metadata.
+
+        Parameters:
+            fingerprint (str): The fingerprint of the assistant configuration.
+
+        Returns:
+            str: The ID of the newest matching assistant or None.
+        """
+        for assistant in self.client.beta.assistants.list(limit=100, order="desc"):
+            if (assistant.metadata or {}).get("fingerprint") == fingerprint:
+                return assistant.id
+
+        return None
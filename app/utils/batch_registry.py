@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+
+class BatchRegistry:
+    """
+    Persistent registry of the batches sent to the OpenAI Batch API, stored in a SQLite file.
+
+    Every batch is tracked with its type, last known status, input file and whether its output
+    was already applied to the articles.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS batches ("
+            "batch_id TEXT PRIMARY KEY, batch_type TEXT NOT NULL, status TEXT NOT NULL, input_file TEXT, "
+            "applied INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def register(self, batch_id: str, batch_type: str, status: str, input_file: str = None):
+        """
+        Add a batch to the registry, a batch that is already registered is left unchanged.
+
+        Parameters:
+            batch_id (str): The ID of the batch.
+            batch_type (str): The type of the batch, e.g. SUMMARY or KEYWORDS.
+            status (str): The status of the batch.
+            input_file (str): The name of the file the batch was created from.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO batches (batch_id, batch_type, status, input_file, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (batch_id, batch_type, status, input_file, now, now)
+            )
+            self.connection.commit()
+
+    def update_status(self, batch_id: str, status: str):
+        """
+        Store the latest status of a batch.
+
+        Parameters:
+            batch_id (str): The ID of the batch.
+            status (str): The status of the batch.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.connection.execute("UPDATE batches SET status = ?, updated_at = ? WHERE batch_id = ?",
+                                    (status, time.time(), batch_id))
+            self.connection.commit()
+
+    def mark_applied(self, batch_id: str):
+        """
+        Mark the output of a batch as applied to the articles.
+
+        Parameters:
+            batch_id (str): The ID of the batch.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.connection.execute("UPDATE batches SET applied = 1, updated_at = ? WHERE batch_id = ?",
+                                    (time.time(), batch_id))
+            self.connection.commit()
+
+    def get_batches(self, batch_type: str, applied: bool = None, exclude_statuses: list = ()):
+        """
+        Get the registered batches of a type.
+
+        Parameters:
+            batch_type (str): The type of the batches.
+            applied (bool): Only batches that were (True) or were not (False) applied, None for all.
+            exclude_statuses (list): Statuses of batches that are left out.
+
+        Returns:
+            list: The batches as dicts, oldest first.
+        """
+        query = "SELECT batch_id, batch_type, status, input_file, applied FROM batches WHERE batch_type = ?"
+        parameters = [batch_type]
+
+        if applied is not None:
+            query += " AND applied = ?"
+            parameters.append(int(applied))
+        if exclude_statuses:
+            query += " AND status NOT IN (" + ", ".join("?" for _ in exclude_statuses) + ")"
+            parameters.extend(exclude_statuses)
+
+        with self.lock:
+            rows = self.connection.execute(query + " ORDER BY created_at", parameters).fetchall()
+
+        return [{"batch_id": batch_id, "batch_type": batch_type, "status": status, "input_file": input_file,
+                 "applied": bool(applied)}
+                for batch_id, batch_type, status, input_file, applied in rows]
@@ -0,0 +1,173 @@
+import atexit
+import glob
+import json
+import os
+import threading
+
+
+class BatchFileWriter:
+    """
+    Buffered writer for the request files of the OpenAI Batch API.
+
+    The current part file stays open and is flushed in blocks. Once the next request would exceed
+    the request or byte limit of a batch, the writer rotates to a new part file, e.g.
+    batch_summary.part0002.jsonl.
+    """
+
+    def __init__(self, batch_name: str, max_requests: int = 50000, max_bytes: int = 100 * 1024 * 1024,
+                 flush_every: int = 500):
+        self.batch_name = batch_name
+        self.base_name, self.extension = os.path.splitext(batch_name)
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+
+        self.file = None
+        self.part_path = None
+        self.request_count = 0
+        self.byte_count = 0
+        self.unflushed_requests = 0
+
+        # the batch api rejects a part with a custom_id that occurs more than once
+        self.custom_ids = set()
+
+        atexit.register(self.close)
+
+    def write(self, request: dict):
+        """
+        Append a request to the current part file, rotating to a new part if a limit would be exceeded.
+        A request with a custom_id that is already in the current part is dropped.
+
+        Parameters:
+            request (dict): The request to add.
+
+        Returns:
+            bool: True if the request was written, False if it was dropped as a duplicate.
+        """
+        line = json.dumps(request) + "\n"
+        size = len(line.encode("utf-8"))
+
+        with self.lock:
+            custom_id = request.get("custom_id")
+            if self.file is not None and custom_id in self.custom_ids:
+                print(f"Request {custom_id} is already in {self.part_path}")
+                return False
+
+            if (self.file is None or self.request_count + 1 > self.max_requests
+                    or self.byte_count + size > self.max_bytes):
+                self.__rotate()
+
+            self.file.write(line)
+            self.request_count += 1
+            self.byte_count += size
+            self.unflushed_requests += 1
+
+            if custom_id is not None:
+                self.custom_ids.add(custom_id)
+
+            if self.unflushed_requests >= self.flush_every:
+                self.file.flush()
+                self.unflushed_requests = 0
+
+        return True
+
+    def close(self):
+        """
+        Flush and close the current part file, the next request starts a new part.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.__close_part()
+
+    def flush(self):
+        """
+        Write the buffered requests of the current part file to disk.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.flush()
+                self.unflushed_requests = 0
+
+    def get_pending_parts(self, close: bool = True):
+        """
+        Get all part files of the batch that were not sent yet.
+        A file with the plain batch name, written by earlier versions, is included as well.
+
+        Parameters:
+            close (bool): Whether the current part is closed, so it can be sent (default: True).
+                          Otherwise it is only flushed and further requests are added to it.
+
+        Returns:
+            list: The paths of the pending part files, oldest first.
+        """
+        with self.lock:
+            if close:
+                self.__close_part()
+            elif self.file is not None:
+                self.file.flush()
+                self.unflushed_requests = 0
+            parts = sorted(glob.glob(glob.escape(self.base_name) + ".part*" + self.extension))
+
+        if os.path.exists(self.batch_name):
+            parts.insert(0, self.batch_name)
+        return [part for part in parts if os.path.getsize(part) > 0]
+
+    def __rotate(self):
+        """
+        Close the current part file and open the next one.
+        Must be called while holding the lock.
+
+        Returns:
+            None
+        """
+        self.__close_part()
+
+        existing_parts = glob.glob(glob.escape(self.base_name) + ".part*" + self.extension)
+        index = max([self.__get_part_index(part) for part in existing_parts], default=0) + 1
+
+        #exclusive mode, so two processes never write into the same part
+        while True:
+            part_path = f"{self.base_name}.part{index:04d}{self.extension}"
+            try:
+                self.file = open(part_path, "x", encoding="utf-8", buffering=1024 * 1024)
+                break
+            except FileExistsError:
+                index += 1
+
+        self.part_path = part_path
+        self.request_count = 0
+        self.byte_count = 0
+        self.unflushed_requests = 0
+
+    def __close_part(self):
+        """
+        Flush and close the current part file.
+        Must be called while holding the lock.
+
+        Returns:
+            None
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.part_path = None
+            self.custom_ids = set()
+
+    def __get_part_index(self, part_path: str):
+        """
+        Get the index of a part file from its name.
+
+        Parameters:
+            part_path (str): The path of the part file.
+
+        Returns:
+            int: The index of the part, 0 if the name does not contain one.
+        """
+        index = part_path[len(self.base_name) + len(".part"):len(part_path) - len(self.extension)]
+        return int(index) if index.isdigit() else 0
@@ -0,0 +1,36 @@
+import os
+
+import chromadb
+
+
+def create_chroma_client(backend: str = None):
+    """
+    Create the chroma client of the configured storage backend.
+
+    The backend is read from CHROMA_BACKEND:
+        http (default): a chroma server at CHROMA_HOST:CHROMA_PORT (chromadb:8000 in docker, localhost:8000 otherwise)
+        persistent: an embedded database stored at CHROMA_PATH (default: db/storage), without network hop
+        memory: an embedded database that only lives in memory, e.g. for tests
+
+    Parameters:
+        backend (str): The storage backend, overrides CHROMA_BACKEND.
+
+    Returns:
+        ClientAPI: The chroma client.
+    """
+    backend = (backend or os.getenv("CHROMA_BACKEND", "http")).lower()
+
+    if backend == "persistent":
+        return chromadb.PersistentClient(path=os.getenv("CHROMA_PATH", "db/storage"))
+
+    if backend == "memory":
+        return chromadb.EphemeralClient()
+
+    if backend == "http":
+        if os.getenv('IS_DOCKER') == "true":
+            default_host = "chromadb"
+        else:
+            default_host = "localhost"
+        return chromadb.HttpClient(host=os.getenv("CHROMA_HOST", default_host), port=int(os.getenv("CHROMA_PORT", 8000)))
+
+    raise ValueError(f"Unknown chroma backend: {backend}, expected http, persistent or memory")
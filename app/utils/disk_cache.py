@@ -0,0 +1,200 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Persistent key-value cache for JSON-serializable values, stored in a SQLite file.
+
+    Entries expire after their TTL (None means never), and the least recently used entries
+    are evicted once the stored values exceed max_bytes, down to evict_to of max_bytes,
+    so a full cache does not evict on every write.
+    """
+
+    evict_to = 0.9
+    evict_batch_size = 500
+
+    def __init__(self, path: str, ttl: float = None, max_bytes: int = None):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL, accessed_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        self.connection.commit()
+        self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    @staticmethod
+    def make_key(value) -> str:
+        """
+        Derive a stable key from a JSON-serializable value.
+
+        Parameters:
+            value: The value the key is derived from, e.g. a request payload.
+
+        Returns:
+            str: The SHA-256 hash of the value.
+        """
+        return hashlib.sha256(json.dumps(value, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """
+        Get a cached value.
+
+        Parameters:
+            key (str): The key of the value.
+
+        Returns:
+            The cached value, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT value, size, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            value, size, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.connection.commit()
+                self.total_bytes -= size
+                return None
+
+            self.connection.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+
+        return json.loads(value)
+
+    def get_many(self, keys: list):
+        """
+        Get many cached values at once.
+
+        Parameters:
+            keys (list[str]): The keys of the values.
+
+        Returns:
+            dict: The cached values by key, missing and expired keys are left out.
+        """
+        now = time.time()
+        values = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self.lock:
+            # sqlite limits the number of parameters of a statement
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self.connection.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders}) "
+                    f"AND (expires_at IS NULL OR expires_at > ?)", (*chunk, now)
+                ).fetchall()
+                self.connection.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?",
+                                            [(now, key) for key, _ in rows])
+                values.update((key, value) for key, value in rows)
+            self.connection.commit()
+
+        return {key: json.loads(value) for key, value in values.items()}
+
+    def set(self, key: str, value, ttl: float = -1):
+        """
+        Store a value.
+
+        Parameters:
+            key (str): The key of the value.
+            value: The JSON-serializable value to store.
+            ttl (float): The seconds until the value expires, None for never (default: the TTL of the cache).
+
+        Returns:
+            None
+        """
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, values: dict, ttl: float = -1):
+        """
+        Store many values in one transaction.
+
+        Parameters:
+            values (dict): The JSON-serializable values to store, by key.
+            ttl (float): The seconds until the values expire, None for never (default: the TTL of the cache).
+
+        Returns:
+            None
+        """
+        ttl = self.ttl if ttl == -1 else ttl
+        now = time.time()
+        expires_at = None if ttl is None else now + ttl
+
+        with self.lock:
+            for key, value in values.items():
+                serialized = json.dumps(value, ensure_ascii=False)
+                size = len(serialized.encode("utf-8"))
+                previous = self.connection.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, serialized, size, expires_at, now)
+                )
+                self.total_bytes += size - (previous[0] if previous else 0)
+
+            self.__evict()
+            self.connection.commit()
+
+    def delete(self, key: str):
+        """
+        Remove a value.
+
+        Parameters:
+            key (str): The key of the value.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.connection.commit()
+            self.total_bytes = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+    def __evict(self):
+        """
+        Remove expired entries and then the least recently used ones in batches, until the cache
+        fits into evict_to of max_bytes.
+        Must be called while holding the lock.
+
+        Returns:
+            None
+        """
+        if self.max_bytes is None or self.total_bytes <= self.max_bytes:
+            return
+
+        now = time.time()
+        expired_bytes = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM cache WHERE expires_at <= ?", (now,)).fetchone()[0]
+        if expired_bytes:
+            self.connection.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self.total_bytes -= expired_bytes
+
+        target_bytes = self.max_bytes * self.evict_to
+        while self.total_bytes > target_bytes:
+            evicted_bytes, evicted_entries = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM "
+                "(SELECT size FROM cache ORDER BY accessed_at LIMIT ?)", (self.evict_batch_size,)
+            ).fetchone()
+            if evicted_entries == 0:
+                self.total_bytes = 0
+                break
+
+            self.connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (self.evict_batch_size,)
+            )
+            self.total_bytes -= evicted_bytes
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache with a maximum number of entries, least recently used eviction,
+    a TTL per entry and hit/miss counters.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Get a cached value and mark it as recently used.
+
+        Parameters:
+            key: The hashable key of the value.
+
+        Returns:
+            The cached value, or None if it is missing or expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or (self.ttl is not None and time.monotonic() - entry[1] > self.ttl):
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used value if the cache is full.
+
+        Parameters:
+            key: The hashable key of the value.
+            value: The value to store.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """
+        Remove the values whose key matches a predicate.
+
+        Parameters:
+            predicate (callable): Receives a key and returns True if its value is removed, None removes everything.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            if predicate is None:
+                self.entries.clear()
+                return
+
+            for key in [key for key in self.entries if predicate(key)]:
+                del self.entries[key]
+
+    def stats(self):
+        """
+        Get the size and the hit/miss counters of the cache.
+
+        Returns:
+            dict: The number of entries, hits and misses.
+        """
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+# all dates are stored as days since this date, so they can be compared in where filters
+initial_date = datetime.strptime("2010-01-01", "%Y-%m-%d").date()
+
+
+def date_count_transform(metadata: dict):
+    """
+    Set the date_count of an article to the days between the initial date and its publication date.
+
+    Parameters:
+        metadata (dict): The metadata of the article.
+
+    Returns:
+        dict: The updated metadata, or None if nothing changed or the article has no valid publication date.
+    """
+    try:
+        article_date = datetime.strptime(metadata["published"], "%Y-%m-%d").date()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    date_count = (article_date - initial_date).days
+    if metadata.get("date_count") == date_count:
+        return None
+
+    metadata["date_count"] = date_count
+    return metadata
@@ -1,12 +1,28 @@
+import argparse
+import json
+import os
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
-url = "http://localhost:4000/api/v1/articles/news/all"
+base_url = "http://localhost:4000/api/v1"
 
 # Pfad zur Textdatei, die die Themen enthält
 file_path = "topics"
 
+# Pfad zur Datei, in der die abgeschlossenen (Thema, Monat)-Einheiten gespeichert werden
+checkpoint_path = "news_retrieval_checkpoint.jsonl"
+
+checkpoint_lock = threading.Lock()
+
+# Sekunden, die auf eine einzelne HTTP-Anfrage bzw. auf eine ganze (Thema, Monat)-Einheit gewartet wird
+request_timeout = 30
+unit_timeout = 3600
+
+
 def generate_monthly_dates(start_date, end_date):
     """
     Generate a list of start and end dates for each month between start_date and end_date.
@@ -32,20 +48,77 @@ def generate_monthly_dates(start_date, end_date):
     return monthly_dates
 
 
-def call_news_api_for_month(topic, start_date, end_date):
+def get_unit_key(topic, start_date, end_date):
     """
-    Call the news API for a specific topic and date range.
+    Get the key of a (topic, month) unit, as it is stored in the checkpoint file.
 
     Parameters:
         topic (str): The topic for the news articles.
         start_date (datetime): The start date of the range.
         end_date (datetime): The end date of the range.
 
+    Returns:
+        str: The key of the unit.
+    """
+    return f"{topic}|{start_date.strftime('%d/%m/%Y')}|{end_date.strftime('%d/%m/%Y')}"
+
+
+def load_checkpoint(path):
+    """
+    Load the keys of all units that were completed in earlier runs.
+
+    Parameters:
+        path (str): The path of the checkpoint file.
+
+    Returns:
+        set: The keys of the completed units.
+    """
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, "r") as file:
+        return {json.loads(line)["unit"] for line in file if line.strip()}
+
+
+def save_checkpoint(path, unit_key, job):
+    """
+    Append a completed unit to the checkpoint file.
+
+    Parameters:
+        path (str): The path of the checkpoint file.
+        unit_key (str): The key of the completed unit.
+        job (dict): The finished ingestion job of the unit.
+
     Returns:
         None
     """
-    url = "http://localhost:4000/api/v1/articles/news/all"
+    entry = {
+        "unit": unit_key,
+        "pages_fetched": job.get("pages_fetched"),
+        "articles_stored": job.get("articles_stored"),
+        "finished_at": job.get("finished_at")
+    }
+    with checkpoint_lock, open(path, "a") as file:
+        file.write(json.dumps(entry) + "\n")
 
+
+def call_news_api_for_month(topic, start_date, end_date, poll_interval=2, timeout=None):
+    """
+    Start an ingestion job for a specific topic and date range and wait until it is finished.
+
+    A job that is unknown to the backend, e.g. after a restart, raises an HTTPError and a job that does not
+    finish within the timeout raises a TimeoutError, so the unit is counted as failed and retried in the next run.
+
+    Parameters:
+        topic (str): The topic for the news articles.
+        start_date (datetime): The start date of the range.
+        end_date (datetime): The end date of the range.
+        poll_interval (float): The seconds between two status requests.
+        timeout (float): The seconds to wait for the job at most (default: unit_timeout).
+
+    Returns:
+        dict: The finished job, including its status and progress.
+    """
     request_data = {
         "start_date": start_date.strftime("%d/%m/%Y"),
         "end_date": end_date.strftime("%d/%m/%Y"),
@@ -53,23 +126,102 @@ def call_news_api_for_month(topic, start_date, end_date):
         "topic": topic
     }
 
-    response = requests.post(url, json=request_data)
+    response = requests.post(base_url + "/jobs/articles/news/all", json=request_data, timeout=request_timeout)
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
 
-    if response.status_code == 200:
-        print(f"Successfully called API for {start_date.strftime('%B %Y')}")
-    else:
-        print(f"Failed to call API for {start_date.strftime('%B %Y')}. Status code: {response.status_code}")
+    deadline = time.monotonic() + (timeout or unit_timeout)
+    while time.monotonic() < deadline:
+        time.sleep(poll_interval)
+        response = requests.get(base_url + "/jobs/" + job_id, timeout=request_timeout)
+        response.raise_for_status()
+        job = response.json()
+        if job.get("status") in ["completed", "failed"]:
+            return job
 
+    raise TimeoutError(f"Job {job_id} did not finish within {timeout or unit_timeout} s")
 
-with open(file_path, 'r') as file:
-    start_date = datetime.strptime("01/05/2023", "%d/%m/%Y")
-    end_date = datetime.strptime("01/06/2024", "%d/%m/%Y")
-    for line in file:
-        topic = line.strip()
-        print(topic)
-        if topic:  # Nur nicht-leere Zeilen verarbeiten
-            monthly_dates = generate_monthly_dates(start_date, end_date)
-            for start, end in monthly_dates:
-                call_news_api_for_month(topic, start, end)
 
-print("Fertig!")
+def run_backfill(topics, start_date, end_date, workers, checkpoint):
+    """
+    Retrieve the articles of all topics for every month between start_date and end_date.
+
+    Units that are listed in the checkpoint file are skipped, every completed unit is added to it.
+
+    Parameters:
+        topics (list): The topics for the news articles.
+        start_date (datetime): The start date.
+        end_date (datetime): The end date.
+        workers (int): The number of units that are retrieved at the same time.
+        checkpoint (str): The path of the checkpoint file.
+
+    Returns:
+        None
+    """
+    completed_units = load_checkpoint(checkpoint)
+    units = [(topic, start, end)
+             for topic in topics
+             for start, end in generate_monthly_dates(start_date, end_date)
+             if get_unit_key(topic, start, end) not in completed_units]
+
+    print(f"{len(units)} units to retrieve, {len(completed_units)} already completed")
+
+    pages_fetched = 0
+    articles_stored = 0
+    failed_units = 0
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(call_news_api_for_month, topic, start, end): (topic, start, end)
+                   for topic, start, end in units}
+
+        for future in as_completed(futures):
+            topic, start, end = futures[future]
+            try:
+                job = future.result()
+            except Exception as exc:
+                failed_units += 1
+                print(f"Failed to call API for {topic}, {start.strftime('%B %Y')}: {exc}")
+                continue
+
+            if job.get("status") != "completed":
+                failed_units += 1
+                print(f"Failed to retrieve {topic}, {start.strftime('%B %Y')}: {job.get('error')}")
+                continue
+
+            save_checkpoint(checkpoint, get_unit_key(topic, start, end), job)
+            pages_fetched += job.get("pages_fetched", 0)
+            articles_stored += job.get("articles_stored", 0)
+            print(f"Successfully retrieved {topic}, {start.strftime('%B %Y')}")
+
+    elapsed = max(time.time() - start_time, 1e-9)
+    print(f"Units: {len(units) - failed_units} completed, {failed_units} failed in {elapsed:.1f} s")
+    print(f"Throughput: {articles_stored / elapsed:.2f} articles/s, {pages_fetched / elapsed:.2f} pages/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieve the news articles of all topics month by month.")
+    parser.add_argument("--topics", default=file_path, help="file with one topic per line")
+    parser.add_argument("--start", default="01/05/2023", help="start date in the format DD/MM/YYYY")
+    parser.add_argument("--end", default="01/06/2024", help="end date in the format DD/MM/YYYY")
+    parser.add_argument("--workers", type=int, default=4, help="number of units retrieved at the same time")
+    parser.add_argument("--checkpoint", default=checkpoint_path, help="file with the completed units")
+    parser.add_argument("--url", default=base_url, help="base url of the backend")
+    parser.add_argument("--unit-timeout", type=float, default=unit_timeout,
+                        help="seconds to wait for the job of one unit")
+    args = parser.parse_args()
+
+    base_url = args.url
+    unit_timeout = args.unit_timeout
+
+    with open(args.topics, 'r') as file:
+        # Nur nicht-leere Zeilen verarbeiten
+        topics = [line.strip() for line in file if line.strip()]
+
+    run_backfill(topics,
+                 datetime.strptime(args.start, "%d/%m/%Y"),
+                 datetime.strptime(args.end, "%d/%m/%Y"),
+                 args.workers,
+                 args.checkpoint)
+
+    print("Fertig!")
@@ -0,0 +1,35 @@
+import heapq
+import math
+
+
+def partition_by_token_budget(items: list, token_counts: list, max_tokens_per_partition: int) -> list[list]:
+    """
+    Split items into partitions of about the same number of tokens.
+
+    The number of partitions is the smallest one that keeps the average partition within the budget.
+    The largest items are placed first, each into the partition with the fewest tokens, so no partition
+    exceeds the budget by more than its largest item. The items of a partition keep their original order.
+
+    Parameters:
+        items (list): The items to split, e.g. articles.
+        token_counts (list[int]): The number of tokens of every item.
+        max_tokens_per_partition (int): The target number of tokens per partition.
+
+    Returns:
+        list: A list of non-empty partitions.
+    """
+    if not items:
+        return []
+
+    partition_count = min(len(items), max(1, math.ceil(sum(token_counts) / max_tokens_per_partition)))
+
+    #(tokens in the partition, partition index) of every partition, the one with the fewest tokens first
+    partition_heap = [(0, index) for index in range(partition_count)]
+    assigned_indices = [[] for _ in range(partition_count)]
+
+    for item_index in sorted(range(len(items)), key=lambda index: token_counts[index], reverse=True):
+        tokens, partition_index = heapq.heappop(partition_heap)
+        assigned_indices[partition_index].append(item_index)
+        heapq.heappush(partition_heap, (tokens + token_counts[item_index], partition_index))
+
+    return [[items[index] for index in sorted(indices)] for indices in assigned_indices if indices]
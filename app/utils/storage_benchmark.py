@@ -0,0 +1,111 @@
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from app.utils.chroma_client import create_chroma_client
+
+collection_name = "benchmark_articles"
+
+# same dimension as the default embedding function, so vectors are as large as the real ones
+embedding_dimension = 384
+
+
+def create_random_embeddings(amount):
+    """
+    Create random embeddings, so the benchmark measures the storage and not the embedding model.
+
+    Parameters:
+        amount (int): The number of embeddings.
+
+    Returns:
+        list: The embeddings.
+    """
+    return [[random.random() for _ in range(embedding_dimension)] for _ in range(amount)]
+
+
+def benchmark_backend(backend, documents, queries, chunk_size):
+    """
+    Measure the ingest throughput and the query latency of a storage backend.
+
+    Parameters:
+        backend (str): The storage backend (http, persistent or memory).
+        documents (int): The number of documents to ingest.
+        queries (int): The number of date filtered queries.
+        chunk_size (int): The number of documents per add.
+
+    Returns:
+        dict: The ingest throughput and the query latencies of the backend.
+    """
+    client = create_chroma_client(backend)
+    try:
+        client.delete_collection(collection_name)
+    except Exception:
+        pass
+    collection = client.create_collection(collection_name)
+
+    ingest_time = 0
+    for start in range(0, documents, chunk_size):
+        amount = min(chunk_size, documents - start)
+        ids = [f"benchmark-{start + i}" for i in range(amount)]
+        embeddings = create_random_embeddings(amount)
+        metadatas = [{"title": f"article {start + i}", "date_count": random.randint(4000, 5300)} for i in range(amount)]
+
+        start_time = time.perf_counter()
+        collection.add(ids=ids, embeddings=embeddings, documents=ids, metadatas=metadatas)
+        ingest_time += time.perf_counter() - start_time
+
+    latencies = []
+    for query_embedding in create_random_embeddings(queries):
+        lower_boundary = random.randint(4000, 5000)
+
+        start_time = time.perf_counter()
+        collection.query(
+            query_embeddings=[query_embedding],
+            n_results=50,
+            where={"$and": [{"date_count": {"$gte": lower_boundary}}, {"date_count": {"$lt": lower_boundary + 300}}]}
+        )
+        latencies.append((time.perf_counter() - start_time) * 1000)
+
+    client.delete_collection(collection_name)
+    latencies.sort()
+
+    return {
+        "backend": backend,
+        "ingest_documents_per_second": documents / ingest_time,
+        "query_p50_ms": statistics.median(latencies),
+        "query_p95_ms": latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare ingest and query latency of the chroma storage backends.")
+    parser.add_argument("--backends", nargs="+", default=["memory", "persistent", "http"],
+                        help="backends to compare, http needs a running chroma server")
+    parser.add_argument("--documents", type=int, default=5000, help="number of documents to ingest")
+    parser.add_argument("--queries", type=int, default=200, help="number of queries")
+    parser.add_argument("--chunk-size", type=int, default=500, help="number of documents per add")
+    args = parser.parse_args()
+
+    # the persistent backend writes into a temporary directory, so the real database stays untouched
+    temporary_path = tempfile.mkdtemp(prefix="chroma_benchmark_")
+    os.environ["CHROMA_PATH"] = temporary_path
+
+    results = []
+    try:
+        for backend in args.backends:
+            try:
+                results.append(benchmark_backend(backend, args.documents, args.queries, args.chunk_size))
+            except Exception as e:
+                print(f"Backend {backend} skipped: {e}")
+    finally:
+        shutil.rmtree(temporary_path, ignore_errors=True)
+
+    print("backend     | ingest documents/s | query p50 (ms) | query p95 (ms)")
+    print("-" * 68)
+    for result in results:
+        print(f"{result['backend']:<11} | {result['ingest_documents_per_second']:>18.1f} | "
+              f"{result['query_p50_ms']:>14.2f} | {result['query_p95_ms']:>14.2f}")